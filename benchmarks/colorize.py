@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""Compare monochrome and colorized rendering.
+
+Renders a corpus of KSW strings (one per line in a file, or random
+signs) with and without `colorize`, once with a warm glyph cache and
+once with the cache of recolored glyphs disabled, so that every symbol
+is recolored from its template. The best of several runs is reported.
+
+"""
+
+import time
+import argparse
+
+from swip import compose
+from swip.iswa_font import ISWAFont, LRUCache
+
+from glyphograms import random_signs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=20000,
+                        help="Number of random signs without a corpus")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Report the best time of this many runs")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count)
+
+    font = ISWAFont()
+    font.warm(symbol for sign in signs
+              for symbol, _ in compose.parser.parse(sign)[1:])
+    for glyph_cache in (True, False):
+        if not glyph_cache:
+            font.glyphs = LRUCache(0)
+        for colorize in (False, True):
+            duration = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for sign in signs:
+                    compose.glyphogram(sign, colorize=colorize, font=font)
+                duration = min(duration, time.perf_counter() - start)
+            print('glyph cache {:3s} colorize {:3s} {:8.3f}s'.format(
+                'on' if glyph_cache else 'off',
+                'on' if colorize else 'off', duration))
+
+
+if __name__ == '__main__':
+    main()
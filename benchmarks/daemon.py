@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""Compare `swip` invocations with and without the render daemon.
+
+Starts `swip daemon` on a temporary socket, then runs `swip KSW_STRING`
+once per sign for `--count` random signs, as a shell script would,
+with and without `--no-daemon`, and checks that the outputs agree. It
+also reports the round-trip time of a request from a running process.
+
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from swip import daemon
+
+from glyphograms import random_signs
+
+
+def run_all(signs, *options):
+    """Render every sign in its own `swip` process."""
+    start = time.perf_counter()
+    outputs = [subprocess.run(
+        [sys.executable, '-m', 'swip', sign] + list(options),
+        stdout=subprocess.PIPE, check=True).stdout for sign in signs]
+    return time.perf_counter() - start, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200,
+                        help="Number of signs, each rendered by one call")
+    args = parser.parse_args()
+    signs = random_signs(args.count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.environ['SWIP_SOCKET'] = os.path.join(
+            directory, 'swip.sock')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'swip', 'daemon'],
+            stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(path):
+                time.sleep(0.05)
+            local, local_outputs = run_all(signs, '--no-daemon')
+            print('in-process: {:6.2f}ms per call'.format(
+                local / len(signs) * 1000))
+            forwarded, forwarded_outputs = run_all(signs)
+            print('daemon:     {:6.2f}ms per call'.format(
+                forwarded / len(signs) * 1000))
+            print('Outputs identical:', local_outputs == forwarded_outputs)
+
+            start = time.perf_counter()
+            for sign in signs:
+                daemon.request(sign)
+            print('round trip: {:6.2f}ms per request'.format(
+                (time.perf_counter() - start) / len(signs) * 1000))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
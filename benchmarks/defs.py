@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""Measure the effect of shared glyph definitions on document size.
+
+Builds an HTML document with the SVGs of a corpus of KSW strings (one
+per line in a file, or random signs), like the flashcard fronts, once
+with inlined glyphs and once with `compose.SymbolDefs`, and reports the
+size of each document and the time to parse it again.
+
+"""
+
+import io
+import time
+import argparse
+import xml.etree.ElementTree as ET
+
+from swip import compose
+
+from glyphograms import random_signs
+
+ET.register_namespace("", "http://www.w3.org/2000/svg")
+
+
+def document(signs, defs=None):
+    """Serialize an HTML page with the glyphograms of all `signs`."""
+    html = ET.Element('html')
+    body = ET.SubElement(html, 'body')
+    for sign in signs:
+        body.append(ET.parse(io.StringIO(
+            compose.glyphogram(sign, defs=defs))).getroot())
+    if defs is not None:
+        body.insert(0, ET.fromstring(
+            '<svg xmlns="http://www.w3.org/2000/svg">{:s}</svg>'.format(
+                defs.definitions())))
+    return ET.tostring(html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=5000,
+                        help="Number of random signs without a corpus")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count)
+
+    for name, defs in (('inline', None),
+                       ('shared', compose.SymbolDefs())):
+        data = document(signs, defs)
+        start = time.perf_counter()
+        ET.fromstring(data)
+        duration = time.perf_counter() - start
+        print('{:6s} {:10.2f} MB, parsed in {:.3f}s'.format(
+            name, len(data) / 1e6, duration))
+
+
+if __name__ == '__main__':
+    main()
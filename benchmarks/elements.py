@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""Compare embedding signs into an HTML tree via strings and elements.
+
+Builds a flashcard-like HTML table of a corpus of KSW strings (one per
+line in a file, or random signs the size of a full puddle), once by
+rendering each sign to an SVG string and parsing it again, as
+`swflashcards` used to, and once with `compose.glyphogram_element`,
+and reports the time to build and to write the document.
+
+"""
+
+import io
+import time
+import argparse
+import xml.etree.ElementTree as ET
+
+from swip import compose
+
+from glyphograms import random_signs
+
+ET.register_namespace("", compose.SVG)
+
+
+def via_string(ksw_string):
+    return ET.parse(io.StringIO(
+        compose.glyphogram(ksw_string, bound=None))).getroot()
+
+
+def via_element(ksw_string):
+    return compose.glyphogram_element(ksw_string, bound=None)
+
+
+def build(signs, render, columns=5):
+    html = ET.Element('html')
+    table = ET.SubElement(ET.SubElement(html, 'body'), 'table')
+    for i, sign in enumerate(signs):
+        if i % columns == 0:
+            row = ET.SubElement(table, 'tr')
+        ET.SubElement(row, 'td').append(render(sign))
+    return ET.ElementTree(html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=20000,
+                        help="Number of random signs without a corpus")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count)
+
+    # Warm the glyph caches of the font, which both modes share
+    compose.glyphograms(signs)
+    for render in (via_string, via_element):
+        start = time.perf_counter()
+        document = build(signs, render)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        output = io.BytesIO()
+        document.write(output)
+        written = time.perf_counter() - start
+        print('{:12s} build {:6.2f}s, write {:6.2f}s, {:.1f} MB'.format(
+            render.__name__, built, written,
+            len(output.getvalue()) / (1 << 20)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""Compare full and incremental `swflashcards` rebuilds.
+
+Writes a synthetic SPML export of random signs with `--entries`
+entries (and a gloss score file, so that nothing is looked up online),
+builds the flash cards with a manifest, changes `--changed` entries
+and rebuilds them both from scratch and incrementally from the
+manifest, checking that the outputs agree.
+
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+
+from glyphograms import random_signs
+
+ENTRY = ('<entry id="{i:d}"><term>{sign:s}</term><term>{gloss:s}</term>'
+         '<text>Sign {i:d}</text></entry>\n')
+
+
+def write_export(path, signs, glosses):
+    with open(path, 'w') as spml:
+        spml.write('<?xml version="1.0" encoding="UTF-8"?>\n<spml>\n')
+        for i, (sign, gloss) in enumerate(zip(signs, glosses)):
+            spml.write(ENTRY.format(i=i, sign=sign, gloss=gloss))
+        spml.write('</spml>\n')
+
+
+def build(directory, name, *options):
+    """Run swflashcards in `directory`, returning wall time and output."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'swip.swflashcards', 'export.spml',
+         '--gloss-scores', 'scores.json', '--front', name + '_f.html',
+         '--back', name + '_b.html'] + list(options),
+        cwd=directory, check=True, stderr=subprocess.DEVNULL)
+    duration = time.perf_counter() - start
+    outputs = []
+    for side in ('_f.html', '_b.html'):
+        with open(os.path.join(directory, name + side), 'rb') as output:
+            outputs.append(output.read())
+    return duration, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=20000,
+                        help="Number of entries in the export")
+    parser.add_argument("--changed", type=int, default=10,
+                        help="Number of entries changed before rebuilding")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    signs = random_signs(args.entries)
+    glosses = ['{:s}{:d}'.format(
+        ''.join(rng.choice('abcdefghijklmnop') for _ in range(6)), i)
+        for i in range(args.entries)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        export = os.path.join(directory, 'export.spml')
+        with open(os.path.join(directory, 'scores.json'), 'w') as scores:
+            json.dump({gloss: rng.uniform(0, 20) for gloss in glosses},
+                      scores)
+        write_export(export, signs, glosses)
+        duration, _ = build(directory, 'first', '--manifest', 'cards.sqlite')
+        print('{:d} entries, first build:  {:6.2f}s'.format(
+            args.entries, duration))
+
+        for i in rng.sample(range(args.entries), args.changed):
+            signs[i] = random_signs(1, seed=i)[0]
+        write_export(export, signs, glosses)
+        full, full_outputs = build(directory, 'full')
+        print('{:d} changed, full rebuild: {:6.2f}s'.format(
+            args.changed, full))
+        incremental, incremental_outputs = build(
+            directory, 'incremental', '--manifest', 'cards.sqlite')
+        print('{:d} changed, incremental:  {:6.2f}s'.format(
+            args.changed, incremental))
+        print('Outputs identical:', full_outputs == incremental_outputs)
+
+
+if __name__ == '__main__':
+    main()
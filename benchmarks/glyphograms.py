@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""Compare per-string `glyphogram` with batched `glyphograms`.
+
+Renders a corpus of KSW strings (one per line in a file, or random
+signs) with a fresh, cold font for each mode and reports wall time and
+the number of database round-trips.
+
+"""
+
+import time
+import random
+import argparse
+
+from swip import compose
+from swip.iswa_font import ISWAFont
+
+
+def random_signs(count, symbols=300, seed=0):
+    """Generate `count` random signs drawing on a pool of symbols."""
+    rng = random.Random(seed)
+    pool = ['S{:03x}{:x}{:x}'.format(
+        rng.randrange(0x100, 0x38b), rng.randrange(6), rng.randrange(16))
+        for _ in range(symbols)]
+    signs = []
+    for _ in range(count):
+        body = ''.join(
+            '{:s}{:d}x{:d}'.format(rng.choice(pool),
+                                   rng.randrange(450, 550),
+                                   rng.randrange(450, 550))
+            for _ in range(rng.randrange(1, 6)))
+        signs.append('M550x550' + body)
+    return signs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=2000,
+                        help="Number of random signs without a corpus")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="Glyph cache size of the fonts")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count)
+
+    font = ISWAFont(cache_size=args.cache_size)
+    start = time.perf_counter()
+    single = [compose.glyphogram(sign, font=font) for sign in signs]
+    single_time = time.perf_counter() - start
+    single_queries = font.queries
+
+    font = ISWAFont(cache_size=args.cache_size)
+    start = time.perf_counter()
+    batch = compose.glyphograms(signs, font=font)
+    batch_time = time.perf_counter() - start
+    batch_queries = font.queries
+
+    assert single == batch
+    print("{:d} signs".format(len(signs)))
+    print("glyphogram:  {:8.3f}s {:8d} queries".format(
+        single_time, single_queries))
+    print("glyphograms: {:8.3f}s {:8d} queries".format(
+        batch_time, batch_queries))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""Compare ways of measuring the exact bounding boxes of many signs.
+
+Measures a corpus of KSW strings (one per line in a file, or random
+signs) with a fresh, cold font each time: via the glyph snippets (which
+carry widths and heights, but also the whole glyph bodies), with the
+metrics-only `compose.measure_many` and with the vectorized
+`arrays.ink_boxes`, if NumPy is available.
+
+"""
+
+import time
+import argparse
+
+from swip import compose, parser
+from swip.iswa_font import ISWAFont
+try:
+    from swip import arrays
+except ImportError:
+    arrays = None
+
+from glyphograms import random_signs
+
+
+def via_snippets(signs, font):
+    """Measure by loading the glyph snippets of all symbols."""
+    layouts = [parser.parse(sign) for sign in signs]
+    snippets = font.svg_snippets(
+        symbol for layout in layouts for symbol, _ in layout[1:])
+    boxes = []
+    for layout in layouts:
+        box = [float('inf'), float('inf'), float('-inf'), float('-inf')]
+        for symbol, (x, y) in layout[1:]:
+            _, w, h = snippets[font.code(symbol)]
+            box = [min(box[0], x), min(box[1], y),
+                   max(box[2], x + w), max(box[3], y + h)]
+        boxes.append(tuple(box) if layout[1:] else (0, 0, 0, 0))
+    return boxes
+
+
+def via_metrics(signs, font):
+    return compose.measure_many(signs, font)
+
+
+def via_arrays(signs, font):
+    return [tuple(box) for box in
+            arrays.ink_boxes(arrays.parse_many(signs), font).tolist()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=100000,
+                        help="Number of random signs without a corpus")
+    parser.add_argument("--symbols", type=int, default=5000,
+                        help="Number of distinct symbols in random signs")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count, args.symbols)
+
+    methods = [via_snippets, via_metrics]
+    if arrays is not None:
+        methods.append(via_arrays)
+    results = []
+    for method in methods:
+        font = ISWAFont()
+        start = time.perf_counter()
+        results.append(method(signs, font))
+        duration = time.perf_counter() - start
+        print('{:14s} {:6.2f}s, {:d} queries'.format(
+            method.__name__, duration, font.queries))
+    print('Results agree:', all(result == results[0] for result in results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""Benchmark `parser.parse` and `parser.parse_ids`.
+
+Parses a corpus of KSW strings (one per line in a file, or random
+signs) with the precompiled single-pass parser, its integer id variant
+and the previous regex-rebuilding implementation, which is kept here
+for comparison.
+
+"""
+
+import re
+import time
+import argparse
+
+from swip.parser import (
+    COORD_BLOCK, POS_COORD_BLOCK, SYMBOL_BLOCK, re_punc, coordinates,
+    parse, parse_ids, prefix_symbols)
+
+from glyphograms import random_signs
+
+
+def legacy_parse(layout_string):
+    """Parse a layout string like swip 0.1.1 did."""
+    if not layout_string:
+        return [('M', (0, 0))]
+
+    seq = 'A' + ''.join(prefix_symbols(layout_string))
+    sw_string = layout_string.replace(seq, '')
+
+    match = re.fullmatch(
+        '((' + re_punc + ')(' + COORD_BLOCK + '))|'
+        '([BLMR](' + POS_COORD_BLOCK + ')?)'
+        '((' + SYMBOL_BLOCK + COORD_BLOCK + ')*)',
+        sw_string)
+
+    if not match:
+        raise ValueError(
+            'String {:} contained unrecognized elements'.format(
+                sw_string))
+
+    if match.group(1):
+        # This is a punctuation character
+        punct = match.group(2)
+        coord = coordinates(match.group(3))
+        return [
+            ('B', (-coord[0], -coord[1])),
+            (punct, coord)]
+    else:
+        # This is some other character
+
+        cluster = []
+        max_x = max_y = float('-inf')
+        for symbol in re.findall(
+                SYMBOL_BLOCK + COORD_BLOCK,
+                match.group(6)):
+            coord = coordinates(symbol[6:])
+            max_x = max(max_x, coord[0])
+            max_y = max(max_y, coord[1])
+            cluster.append(
+                (symbol[:6], coord))
+        cluster.insert(
+            0, (match.group(4)[0],
+                coordinates(match.group(5)) if match.group(5) else (max_x, max_y)))
+        return cluster
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=100000,
+                        help="Number of random signs without a corpus")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count)
+
+    for function in (legacy_parse, parse, parse_ids):
+        start = time.perf_counter()
+        for sign in signs:
+            function(sign)
+        duration = time.perf_counter() - start
+        print('{:14s} {:8.3f}s {:10.0f} signs/s'.format(
+            function.__name__, duration, len(signs) / duration))
+
+
+if __name__ == '__main__':
+    main()
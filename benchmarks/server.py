@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""Load-test the render server with a local HTTP load generator.
+
+Starts `swip serve` in a subprocess and sends requests for a corpus of
+KSW strings (one per line in a file, or random signs) over several
+concurrent keep-alive connections, reporting throughput and latency
+percentiles. Every sign is requested `--repeat` times, so that the
+response cache and request coalescing come into play.
+
+"""
+
+import sys
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from urllib.parse import quote
+
+from glyphograms import random_signs
+
+
+async def client(host, port, paths, latencies):
+    """Request all `paths` over one connection, recording latencies."""
+    reader, writer = await asyncio.open_connection(host, port)
+    for path in paths:
+        start = time.perf_counter()
+        writer.write('GET {:s} HTTP/1.1\r\nHost: {:s}\r\n\r\n'.format(
+            path, host).encode('latin-1'))
+        await writer.drain()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if not line.strip():
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def load(host, port, paths, connections):
+    latencies = []
+    await asyncio.gather(*(
+        client(host, port, paths[i::connections], latencies)
+        for i in range(connections)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=2000,
+                        help="Number of random signs without a corpus")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of requests per sign")
+    parser.add_argument("--connections", type=int, default=32,
+                        help="Number of concurrent connections")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of server processes")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count)
+    paths = ['/?ksw=' + quote(sign) for sign in signs] * args.repeat
+    random.Random(0).shuffle(paths)
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'swip', 'serve', '--port', str(port),
+         '--workers', str(args.workers)],
+        stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        start = time.perf_counter()
+        latencies = asyncio.run(
+            load('127.0.0.1', port, paths, args.connections))
+        duration = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    print('{:d} requests ({:d} distinct) over {:d} connections'.format(
+        len(paths), len(signs), args.connections))
+    print('{:.2f}s, {:.0f} requests/s'.format(
+        duration, len(paths) / duration))
+    for percentile in (50, 90, 99):
+        print('p{:d} latency: {:.2f} ms'.format(
+            percentile,
+            1000 * latencies[len(latencies) * percentile // 100]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""Benchmark top-k similarity search with `similarity.SimilarityIndex`.
+
+Builds and saves the index of a corpus of KSW strings (one per line in
+a file, or random signs), loads it again and times searches for the
+nearest neighbours of single signs and of batches of signs.
+
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from swip.similarity import SimilarityIndex
+
+from glyphograms import random_signs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=100000,
+                        help="Number of random signs without a corpus")
+    parser.add_argument("-k", type=int, default=10,
+                        help="Number of neighbours to find")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'similarity.npz')
+        start = time.perf_counter()
+        SimilarityIndex.build(signs).save(path)
+        print('Built and saved index of {:d} signs in {:.2f}s, {:.1f} MB'
+              .format(len(signs), time.perf_counter() - start,
+                      os.path.getsize(path) / (1 << 20)))
+        start = time.perf_counter()
+        index = SimilarityIndex.load(path)
+        print('Loaded in {:.3f}s'.format(time.perf_counter() - start))
+
+    for batch in (1, 100, 1000):
+        queries = signs[:batch]
+        start = time.perf_counter()
+        index.search(queries, args.k)
+        duration = time.perf_counter() - start
+        print('{:4d} queries: {:7.1f} ms, {:.1f} ms per query'.format(
+            batch, 1000 * duration, 1000 * duration / batch))
+
+
+if __name__ == '__main__':
+    main()
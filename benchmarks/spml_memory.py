@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""Measure peak memory of SPML ingestion on a synthetic export.
+
+Writes a SignPuddle-style export with `--entries` entries to a
+temporary file and parses it in a fresh process, either by only
+iterating over `iter_spml`, with the streaming `parse_spml` (which
+keeps all signs) or by loading the whole tree like earlier versions
+did, reporting the peak resident set size.
+
+"""
+
+import os
+import sys
+import random
+import tempfile
+import argparse
+import resource
+import subprocess
+
+ENTRY = ('<entry id="{i:d}" cdt="1311183542" mdt="1311183542" usr="Val">'
+         '<term>AS1870aS18701S20500M518x533S1870a489x515S18701482x490'
+         'S20500508x496</term><term>{gloss:s}</term>'
+         '<text>A comment for sign {i:d}</text>'
+         '<src>synthetic</src></entry>\n')
+
+
+def write_export(path, entries, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w') as spml:
+        spml.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   '<spml root="http://www.signbank.org/signpuddle1.6" '
+                   'type="sgn" puddle="4">\n')
+        for i in range(entries):
+            gloss = ''.join(rng.choice('abcdefghijklmnop')
+                            for _ in range(rng.randrange(3, 12)))
+            spml.write(ENTRY.format(i=i, gloss=gloss))
+        spml.write('</spml>\n')
+
+
+def measure(path, mode):
+    """Parse `path` in a child process and return its peak RSS in kB."""
+    code = (
+        'import sys\n'
+        'import xml.etree.ElementTree as ET\n'
+        'from swip import swflashcards\n'
+        'if sys.argv[2] == "tree":\n'
+        '    entries = ET.parse(sys.argv[1]).getroot().findall("entry")\n'
+        '    signs = [swflashcards.Sign.from_spml_entry(e) '
+        'for e in entries]\n'
+        'elif sys.argv[2] == "iter":\n'
+        '    for sign in swflashcards.iter_spml(sys.argv[1]):\n'
+        '        pass\n'
+        'else:\n'
+        '    signs, strange = swflashcards.parse_spml(\n'
+        '        sys.argv[1], scorer=len)\n')
+    subprocess.run([sys.executable, '-c', code, path, mode], check=True)
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=500000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.spml')
+        write_export(path, args.entries)
+        print('{:d} entries, {:.1f} MB'.format(
+            args.entries, os.path.getsize(path) / 1e6))
+        # RUSAGE_CHILDREN reports the maximum over all children, so
+        # measure the smaller footprint first.
+        print('iter_spml  peak RSS: {:8.1f} MB'.format(
+            measure(path, 'iter') / 1024))
+        print('parse_spml peak RSS: {:8.1f} MB'.format(
+            measure(path, 'stream') / 1024))
+        print('ET.parse   peak RSS: {:8.1f} MB'.format(
+            measure(path, 'tree') / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""Check the import time of the swip CLI and library against thresholds.
+
+Runs every scenario a few times with `python -X importtime`, sums up the
+time spent importing modules beyond what the bare interpreter imports,
+and reports the fastest run, which is least disturbed by other
+processes. Exits with status 1 if it is above the threshold of its
+scenario, to catch regressions such as a heavy module imported at the
+top of a commonly used one.
+
+"""
+
+import sys
+import argparse
+import subprocess
+
+# Scenario name, interpreter arguments, threshold in milliseconds
+SCENARIOS = [
+    ('swip --help', ['-m', 'swip', '--help'], 35),
+    ('swip KSW', ['-m', 'swip', 'M18x33S1870an11x15S18701n18xn10'], 50),
+    ('swflashcards --help', ['-m', 'swip.swflashcards', '--help'], 65),
+    ('import swip.compose', ['-c', 'import swip.compose'], 35),
+    ('import swip.parser', ['-c', 'import swip.parser'], 20),
+]
+
+
+def import_times(arguments):
+    """Return the total import time (µs) and the modules imported."""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + arguments,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only top-level imports, which include their nested imports
+        if not name[1:].startswith(' '):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=7,
+                        help="Number of runs of every scenario")
+    args = parser.parse_args()
+
+    bare = set(import_times(['-c', 'pass']))
+    failed = False
+    for name, arguments, threshold in SCENARIOS:
+        totals = []
+        for _ in range(args.runs):
+            times = import_times(arguments)
+            totals.append(sum(time for module, time in times.items()
+                              if module not in bare))
+        best = min(totals) / 1000
+        status = 'ok' if best <= threshold else 'TOO SLOW'
+        failed = failed or best > threshold
+        print('{:22s} {:6.1f}ms (threshold {:3d}ms) {:s}'.format(
+            name, best, threshold, status))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""Benchmark searching signs by symbol with `symbol_index.SymbolIndex`.
+
+Builds an index of a corpus of KSW strings (one per line in a file, or
+random signs), adds more signs to it incrementally, and compares a few
+searches to a scan that parses every sign.
+
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from swip.parser import parse
+from swip.symbol_index import SymbolIndex, parse_term
+
+from glyphograms import random_signs
+
+
+def scan(signs, all_terms=(), any_terms=()):
+    """Search by parsing every sign, for comparison."""
+    all_terms = [parse_term(term) for term in all_terms]
+    any_terms = [parse_term(term) for term in any_terms]
+
+    def matches(symbols, term):
+        (lower, upper), box = term
+        for symbol, (x, y) in symbols:
+            if not lower <= int(symbol[1:], 16) <= upper:
+                continue
+            if box is None or (box[0] <= x <= box[2] and
+                               box[1] <= y <= box[3]):
+                return True
+        return False
+
+    found = []
+    for sign in signs:
+        symbols = parse(sign)[1:]
+        if all(matches(symbols, term) for term in all_terms) and (
+                not any_terms or
+                any(matches(symbols, term) for term in any_terms)):
+            found.append(sign)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", nargs='?', type=argparse.FileType('r'),
+                        help="File with one KSW string per line")
+    parser.add_argument("--count", type=int, default=100000,
+                        help="Number of random signs without a corpus")
+    args = parser.parse_args()
+    if args.corpus:
+        signs = [line.strip() for line in args.corpus if line.strip()]
+    else:
+        signs = random_signs(args.count)
+    extra = random_signs(1000, seed=1)
+
+    # Search for symbols that actually occur
+    first = parse(signs[0])[1:]
+    second = parse(signs[1])[1:]
+    shape, key = first[0][0][:4], first[0][0]
+    other = second[0][0][:4]
+    x, y = first[0][1]
+    queries = [
+        ([shape], []),
+        ([key], []),
+        ([shape, other], []),
+        ([], [shape, other, second[-1][0]]),
+        (['{:s}@{:d},{:d},{:d},{:d}'.format(
+            shape, x - 10, y - 10, x + 10, y + 10)], []),
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.sqlite')
+        index = SymbolIndex(path)
+        start = time.perf_counter()
+        index.add(signs, errors='ignore')
+        print('Indexed {:d} signs in {:.2f}s, {:.1f} MB'.format(
+            len(index), time.perf_counter() - start,
+            os.path.getsize(path) / (1 << 20)))
+        start = time.perf_counter()
+        added = index.add(extra, errors='ignore')
+        print('Added {:d} signs in {:.3f}s'.format(
+            added, time.perf_counter() - start))
+
+        for all_terms, any_terms in queries:
+            start = time.perf_counter()
+            results = index.search(all_terms, any_terms)
+            indexed = time.perf_counter() - start
+            start = time.perf_counter()
+            scanned = scan(signs + extra, all_terms, any_terms)
+            scan_time = time.perf_counter() - start
+            assert {ksw for _, ksw, _ in results} == set(scanned)
+            print('all={:} any={:}: {:d} signs, {:.2f} ms indexed, '
+                  '{:.0f} ms scanning'.format(
+                      all_terms, any_terms, len(results), 1000 * indexed,
+                      1000 * scan_time))
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
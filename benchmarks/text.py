@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Measure how rendering SignWriting texts scales with their length.
+
+Renders texts of random signs (with a little punctuation) of increasing
+length with `text.write_svg` into a sink that only counts characters,
+and reports the time, the output size and the peak memory allocated
+while rendering (in a second run), which should grow linearly and
+stay flat respectively.
+
+"""
+
+import time
+import random
+import argparse
+import tracemalloc
+
+from swip import text
+from swip.iswa_font import ISWAFont
+
+from glyphograms import random_signs
+
+
+class Sink:
+    """A file-like object counting what is written to it."""
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def random_text(count, seed=0):
+    rng = random.Random(seed)
+    signs = random_signs(count, symbols=2000, seed=seed)
+    return ' '.join(
+        sign if rng.random() > 0.1 else sign + ' S38800'
+        for sign in signs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs='+',
+                        default=[1000, 10000, 40000],
+                        help="Numbers of signs in the texts")
+    args = parser.parse_args()
+
+    for count in args.counts:
+        document = random_text(count)
+        font = ISWAFont()
+        sink = Sink()
+        start = time.perf_counter()
+        text.write_svg(document, sink, font)
+        duration = time.perf_counter() - start
+        # Tracing allocations is slow, so measure memory separately
+        tracemalloc.start()
+        text.write_svg(document, Sink(), ISWAFont())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('{:6d} signs: {:6.2f}s, {:6.1f} MB written, '
+              'peak {:5.1f} MB allocated, {:d} queries'.format(
+                  count, duration, sink.size / (1 << 20), peak / (1 << 20),
+                  font.queries))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""Measure the throughput of threads rendering with one shared font.
+
+Renders random signs with `compose.glyphogram` from a pool of 1, 2, 4
+and 8 threads sharing a single `ISWAFont`, each thread querying the
+database through its own connection, and checks that the results agree
+with rendering in one thread. With `--cache-size 0`, every glyph is
+fetched from the database, whose queries run without holding the GIL.
+
+"""
+
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from swip import compose
+from swip.iswa_font import ISWAFont
+
+from glyphograms import random_signs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=20000,
+                        help="Number of random signs")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Glyph cache size of the shared font")
+    parser.add_argument("--threads", type=int, nargs='+',
+                        default=[1, 2, 4, 8],
+                        help="Numbers of threads to compare")
+    args = parser.parse_args()
+    signs = random_signs(args.count, symbols=5000)
+    print('{:d} signs, {:d} CPUs'.format(len(signs), os.cpu_count()))
+
+    expected = None
+    for threads in args.threads:
+        font = ISWAFont(cache_size=args.cache_size)
+        with ThreadPoolExecutor(threads) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(
+                lambda sign: compose.glyphogram(sign, font=font), signs))
+            duration = time.perf_counter() - start
+        if expected is None:
+            expected = results
+        print('{:2d} threads: {:8.0f} signs/s, {:6d} queries, '
+              'results agree: {:}'.format(
+                  threads, len(signs) / duration, font.queries,
+                  results == expected))
+
+
+if __name__ == '__main__':
+    main()
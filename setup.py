@@ -11,6 +11,9 @@ setup(
     install_requires=[
         # 'sqlite3',
     ],
+    extras_require={
+        'arrays': ['numpy'],
+    },
     include_package_data=True,
     license="MIT",
     zip_safe=False,
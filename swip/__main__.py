@@ -2,17 +2,48 @@
 
 "Render Kartesian SignWriting strings as SVG graphics."
 
+import os
 import sys
-import argparse
+import importlib
 
-from .compose import glyphogram
-from .iswa_font import ISWAFont
+# Further commands, by name, with the module providing their `main`
+COMMANDS = {
+    'bulk': 'swip.bulk',
+    'cache': 'swip.render_cache',
+    'convert': 'swip.convert',
+    'daemon': 'swip.daemon',
+    'font-pack': 'swip.font_pack',
+    'index': 'swip.symbol_index',
+    'serve': 'swip.server',
+    'similar': 'swip.similarity',
+    'sprite': 'swip.sprite',
+    'text': 'swip.text',
+    'validate': 'swip.validate',
+}
 
 
-def main():
+def main(argv=None):
     """The main CLI."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        return importlib.import_module(COMMANDS[argv[0]]).main(argv[1:])
+    asked = len(argv) == 1 and not argv[0].startswith('-')
+    if asked:
+        # Scripts mostly call `swip KSW_STRING`: Ask a running daemon
+        # before even importing argparse
+        from .daemon import request
+        svg = request(argv[0], cache_dir=os.environ.get('SWIP_CACHE_DIR'))
+        if svg is not None:
+            sys.stdout.write(svg)
+            return
+
+    import argparse
     parser = argparse.ArgumentParser(
-        description=__doc__)
+        prog='swip',
+        description=__doc__,
+        epilog="Further commands: {:s} (see swip COMMAND --help)".format(
+            ', '.join(sorted(COMMANDS))))
     parser.add_argument(
         "ksw_string",
         help="The KSW string to be rendered.")
@@ -30,16 +61,61 @@ def main():
         "--font",
         default="font_svg1",
         help="The font to use")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--font-pack",
+        default=None,
+        help="Read glyphs from this font pack instead of the database")
+    parser.add_argument(
+        "--sprite",
+        default=None,
+        help="Reference glyphs in this sprite sheet URL instead of "
+        "including them")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get('SWIP_CACHE_DIR'),
+        help="Directory caching rendered signs (default: $SWIP_CACHE_DIR)")
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        default=False,
+        help="Render in this process, even if `swip daemon` is running")
+    args = parser.parse_args(argv)
     if args.auto_output and args.output != sys.stdout:
         raise ValueError("Both auto-output and output file specified.")
     elif args.auto_output:
         args.output = open(args.ksw_string + '.svg', 'w')
 
-    args.output.write(
-        glyphogram(args.ksw_string,
-                   font=ISWAFont(name=args.font)))
+    svg = None
+    if not (args.no_daemon or asked):
+        from .daemon import request
+        svg = request(args.ksw_string, args.font, args.font_pack,
+                      args.sprite, args.cache_dir)
+    if svg is None:
+        svg = render(args)
+    args.output.write(svg)
+
+
+def render(args):
+    """Render the sign of the parsed `args` in this process."""
+    # Rendering modules are imported only when needed, to keep `--help`
+    # and single renders quick to start
+    from .compose import SpriteRef, glyphogram
+    from .iswa_font import ISWAFont
+    if args.font_pack:
+        from .font_pack import PackedFont
+        font = PackedFont(args.font_pack)
+    else:
+        font = ISWAFont(name=args.font)
+
+    if args.cache_dir and not args.sprite:
+        from .render_cache import RenderCache
+        return RenderCache(args.cache_dir).glyphogram(
+            args.ksw_string, font=font)
+    return glyphogram(
+        args.ksw_string,
+        font=font,
+        defs=SpriteRef(args.sprite) if args.sprite else None)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+"""arrays: Columnar parsing of many SignWriting strings with NumPy
+
+`parse_many` parses a whole corpus of KSW strings into flat NumPy
+arrays, so that properties of all signs, such as bounding boxes or
+symbol type counts, are computed by single array operations instead
+of loops over `parser.parse` results.
+
+This module requires NumPy.
+
+"""
+
+from array import array
+
+import numpy
+
+from . import parser
+
+# One row per symbol placed in a sign: the index of the sign, the basic
+# shape of the symbol (e.g. 0x18a for S18a25), its fill and rotation
+# and its coordinates.
+PLACEMENT = numpy.dtype([
+    ('sign', '<u4'),
+    ('symbol', '<u2'),
+    ('fill', 'u1'),
+    ('rotation', 'u1'),
+    ('x', '<i2'),
+    ('y', '<i2')])
+
+# The fundamental symbol types, in the order of their ranges
+SYMBOL_TYPES = tuple(
+    type for type in sorted(parser.symbol_ranges,
+                            key=lambda t: parser.symbol_ranges[t])
+    if type not in ('iswa', 'writing'))
+_TYPE_LOWER = numpy.array(
+    [parser.symbol_ranges[type][0] for type in SYMBOL_TYPES])
+_TYPE_UPPER = numpy.array(
+    [parser.symbol_ranges[type][1] for type in SYMBOL_TYPES])
+
+
+class ParsedSigns:
+    """The symbol placements of many signs, in columns.
+
+    `placements` is a structured array of `PLACEMENT` rows, sorted by
+    sign. The placements of sign `i` are
+    `placements[offsets[i]:offsets[i + 1]]`. `lanes` holds the lane
+    letter of every sign (b'' for strings that could not be parsed),
+    `max_coordinates` its maximum coordinates as an (n, 2) array, and
+    `valid` whether the string was parsed at all.
+
+    """
+    def __init__(self, placements, offsets, lanes, max_coordinates, valid):
+        self.placements = placements
+        self.offsets = offsets
+        self.lanes = lanes
+        self.max_coordinates = max_coordinates
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.lanes)
+
+    def __getitem__(self, i):
+        """The placements of sign `i`."""
+        return self.placements[self.offsets[i]:self.offsets[i + 1]]
+
+    def counts(self):
+        """The number of symbols placed in every sign."""
+        return numpy.diff(self.offsets)
+
+
+def _check_coordinates(string, coordinates):
+    """Raise a ValueError if coordinates do not fit the int16 columns."""
+    for x, y in coordinates:
+        if not (-0x8000 <= x < 0x8000 and -0x8000 <= y < 0x8000):
+            raise ValueError('Coordinates out of range in {:}'.format(
+                string))
+
+
+def parse_many(strings, errors='raise'):
+    """Parse many KSW strings into a `ParsedSigns` structure.
+
+    If `errors` is 'raise', a string that cannot be parsed, or whose
+    coordinates do not fit 16 bits, raises a ValueError. If it is
+    'ignore', such a string becomes a sign without symbols that is
+    marked as not valid.
+
+    >>> signs = parse_many([
+    ...     'M18x33S1870an11x15S18701n18xn10S205008xn4S2e7340xn32',
+    ...     'S38800n36xn4'])
+    >>> signs.offsets
+    array([0, 4, 5])
+    >>> signs[1]
+    array([(1, 904, 0, 0, -36, -4)],
+          dtype=[('sign', '<u4'), ('symbol', '<u2'), ('fill', 'u1'), ('rotation', 'u1'), ('x', '<i2'), ('y', '<i2')])
+    >>> signs.lanes
+    array([b'M', b'B'], dtype='|S1')
+    >>> signs.max_coordinates.tolist()
+    [[18, 33], [36, 4]]
+    >>> invalid = parse_many(['M18x33', 'Mfoo', 'B', 'M40000x10'],
+    ...                      errors='ignore')
+    >>> invalid.valid
+    array([ True, False,  True, False])
+    >>> invalid.lanes
+    array([b'M', b'', b'B', b''], dtype='|S1')
+
+    """
+    if errors not in ('raise', 'ignore'):
+        raise ValueError('Unknown error handling: {:}'.format(errors))
+    sign_index = array('I')
+    keys = array('I')
+    xs = array('h')
+    ys = array('h')
+    offsets = array('q', [0])
+    lanes = bytearray()
+    max_xy = array('h')
+    valid = bytearray()
+
+    for i, string in enumerate(strings):
+        try:
+            layout = parser.parse_ids(string)
+            (lane, (max_x, max_y)), symbols = layout[0], layout[1:]
+            if not symbols and max_x == float('-inf'):
+                # A bare lane, without symbols or coordinates
+                max_x = max_y = 0
+            _check_coordinates(string, [(max_x, max_y)] + [
+                xy for _, xy in symbols])
+        except ValueError:
+            if errors == 'raise':
+                raise
+            offsets.append(len(keys))
+            lanes += b' '
+            max_xy.extend((0, 0))
+            valid.append(0)
+            continue
+        for key, (x, y) in symbols:
+            keys.append(key)
+            xs.append(x)
+            ys.append(y)
+        sign_index.extend([i] * len(symbols))
+        offsets.append(len(keys))
+        lanes += lane.encode('ascii')
+        max_xy.extend((max_x, max_y))
+        valid.append(1)
+
+    keys = numpy.frombuffer(keys, dtype=numpy.uint32)
+    placements = numpy.empty(len(keys), dtype=PLACEMENT)
+    placements['sign'] = numpy.frombuffer(sign_index, dtype=numpy.uint32)
+    placements['symbol'] = keys >> 8
+    placements['fill'] = keys >> 4 & 0xf
+    placements['rotation'] = keys & 0xf
+    placements['x'] = numpy.frombuffer(xs, dtype=numpy.int16)
+    placements['y'] = numpy.frombuffer(ys, dtype=numpy.int16)
+
+    lanes = numpy.frombuffer(bytes(lanes), dtype='S1').copy()
+    valid = numpy.frombuffer(bytes(valid), dtype=numpy.uint8).astype(bool)
+    lanes[~valid] = b''
+    return ParsedSigns(
+        placements,
+        numpy.frombuffer(offsets, dtype=numpy.int64),
+        lanes,
+        numpy.frombuffer(max_xy, dtype=numpy.int16).reshape(-1, 2),
+        valid)
+
+
+def min_coordinates(signs, min_is_zero=True):
+    """The minimum symbol coordinates of every sign, as an (n, 2) array.
+
+    The vectorized equivalent of `parser.min_coordinates`. Signs
+    without symbols get (0, 0), also if `min_is_zero` is false.
+
+    >>> signs = parse_many(['M18x33S1870an11x15S18701n18xn10', 'M5x5'])
+    >>> min_coordinates(signs, False).tolist()
+    [[-18, -10], [0, 0]]
+    >>> min_coordinates(parse_many(['M18x33S1870a11x15'])).tolist()
+    [[0, 0]]
+
+    """
+    result = numpy.zeros((len(signs), 2), dtype=numpy.int16)
+    counts = signs.counts()
+    nonempty = counts > 0
+    if nonempty.any():
+        starts = signs.offsets[:-1][nonempty]
+        result[nonempty, 0] = numpy.minimum.reduceat(
+            signs.placements['x'], starts)
+        result[nonempty, 1] = numpy.minimum.reduceat(
+            signs.placements['y'], starts)
+    if min_is_zero:
+        numpy.minimum(result, 0, out=result)
+    return result
+
+
+def bounding_boxes(signs):
+    """The (x_min, y_min, x_max, y_max) of every sign, as (n, 4) array.
+
+    The minimum is taken over the symbol origins, the maximum from the
+    lane, like `compose.glyphogram` does.
+
+    >>> bounding_boxes(parse_many(
+    ...     ['M18x33S1870an11x15S18701n18xn10'])).tolist()
+    [[-18, -10, 18, 33]]
+
+    """
+    return numpy.hstack(
+        [min_coordinates(signs, False), signs.max_coordinates])
+
+
+def known_symbols(symbols):
+    """Whether the basic shape ids in an array are in a symbol type range.
+
+    >>> known_symbols(numpy.array([0x100, 0x3ff])).tolist()
+    [True, False]
+
+    """
+    symbols = numpy.asarray(symbols)
+    types = numpy.searchsorted(_TYPE_LOWER, symbols, side='right') - 1
+    return (types >= 0) & (symbols <= _TYPE_UPPER[numpy.maximum(types, 0)])
+
+
+def symbol_types(symbols):
+    """Classify basic shapes into indices of `SYMBOL_TYPES`.
+
+    The vectorized equivalent of `parser.symbol_type`, taking an array
+    of basic shape ids (like the 'symbol' column of placements) and
+    returning an array of indices into `SYMBOL_TYPES`.
+
+    >>> types = symbol_types(numpy.array([0x100, 0x38b, 0x37e]))
+    >>> [SYMBOL_TYPES[t] for t in types]
+    ['hand', 'punctuation', 'limb']
+
+    """
+    symbols = numpy.asarray(symbols)
+    if not known_symbols(symbols).all():
+        raise ValueError('Not a valid symbol in array')
+    return numpy.searchsorted(_TYPE_LOWER, symbols, side='right') - 1
+
+
+def symbol_type_counts(signs):
+    """Count the symbols of each type in every sign.
+
+    Return an (n, len(SYMBOL_TYPES)) array.
+
+    >>> symbol_type_counts(parse_many(
+    ...     ['M18x33S1870an11x15S18701n18xn10S205008xn4'])).tolist()
+    [[2, 1, 0, 0, 0, 0, 0, 0]]
+
+    """
+    types = symbol_types(signs.placements['symbol'])
+    return numpy.bincount(
+        signs.placements['sign'].astype(numpy.int64) * len(SYMBOL_TYPES)
+        + types,
+        minlength=len(signs) * len(SYMBOL_TYPES)).reshape(
+            len(signs), len(SYMBOL_TYPES))
+
+
+def symbol_codes(signs):
+    """The font database code (see `ISWAFont.code`) of every placement."""
+    placements = signs.placements
+    return (1 + (placements['symbol'].astype(numpy.int64) - 0x100) * 96
+            + placements['fill'].astype(numpy.int64) * 16
+            + placements['rotation'])
+
+
+def ink_boxes(signs, font):
+    """The exact (x_min, y_min, x_max, y_max) of every sign, as (n, 4).
+
+    The vectorized equivalent of `compose.measure`, taking widths and
+    heights from `font.metrics()`. Signs without symbols get zeros.
+
+    >>> from .iswa_font import ISWAFont
+    >>> ink_boxes(parse_many(
+    ...     ['M18x33S10000n10xn15S1000f5x3', 'M5x5']), ISWAFont()).tolist()
+    [[-10, -15, 35, 24], [0, 0, 0, 0]]
+
+    """
+    widths, heights = (numpy.frombuffer(metric, dtype=numpy.uint16)
+                       for metric in font.metrics())
+    codes = symbol_codes(signs)
+    if len(codes) and (codes.max() >= len(widths) or
+                       not widths[codes].all()):
+        raise ValueError('No glyph for some symbols')
+    x = signs.placements['x'].astype(numpy.int32)
+    y = signs.placements['y'].astype(numpy.int32)
+    result = numpy.zeros((len(signs), 4), dtype=numpy.int32)
+    nonempty = signs.counts() > 0
+    if nonempty.any():
+        starts = signs.offsets[:-1][nonempty]
+        result[nonempty, 0] = numpy.minimum.reduceat(x, starts)
+        result[nonempty, 1] = numpy.minimum.reduceat(y, starts)
+        result[nonempty, 2] = numpy.maximum.reduceat(x + widths[codes], starts)
+        result[nonempty, 3] = numpy.maximum.reduceat(
+            y + heights[codes], starts)
+    return result
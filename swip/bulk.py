@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+"""bulk: Render many KSW strings in parallel
+
+Read KSW strings, one per line, and render them in a pool of worker
+processes, each with its own font. The SVGs are written to a directory
+or into a tar or zip archive, in input order, as NNNNNN.svg where
+NNNNNN is the zero-padded line number of the string.
+
+"""
+
+import io
+import os
+import sys
+import time
+import tarfile
+import zipfile
+import argparse
+import multiprocessing
+
+from .compose import glyphogram
+from .font_pack import PackedFont
+from .iswa_font import ISWAFont
+from .render_cache import RenderCache
+
+_font = None
+_render_glyphogram = glyphogram
+
+
+def _init_worker(db, name, pack, cache_dir=None):
+    """Open the font (and render cache) of this worker process."""
+    global _font, _render_glyphogram
+    if pack:
+        _font = PackedFont(pack)
+    else:
+        _font = ISWAFont(db=db, name=name)
+    if cache_dir:
+        _render_glyphogram = RenderCache(cache_dir).glyphogram
+    else:
+        _render_glyphogram = glyphogram
+
+
+def _render(task):
+    """Render one numbered line, returning the SVG or the error."""
+    number, ksw_string = task
+    try:
+        return (number, ksw_string,
+                _render_glyphogram(ksw_string, font=_font), None)
+    except Exception as error:
+        return number, ksw_string, None, error
+
+
+def render_all(lines, jobs=None, db=None, name="font_svg1", pack=None,
+               chunksize=64, cache_dir=None):
+    """Render the KSW strings in `lines` using `jobs` processes.
+
+    Yield tuples (line number, KSW string, SVG, error) in input order,
+    where exactly one of SVG and error is None. Blank lines are
+    skipped, but still counted. If `cache_dir` is given, the workers
+    share a `RenderCache` in that directory.
+
+    >>> for number, ksw_string, svg, error in render_all(
+    ...         ['M18x33S1870an11x15', '  ', 'Mfoo', 'S38800n36xn4'],
+    ...         jobs=1):
+    ...     print(number, ksw_string, svg is not None, repr(error))
+    1 M18x33S1870an11x15 True None
+    3 Mfoo False ValueError('String Mfoo contained unrecognized elements')
+    4 S38800n36xn4 True None
+
+    """
+    tasks = ((number, line.strip())
+             for number, line in enumerate(lines, 1)
+             if line.strip())
+    if jobs == 1:
+        _init_worker(db, name, pack, cache_dir)
+        yield from map(_render, tasks)
+        return
+    with multiprocessing.Pool(
+            jobs, initializer=_init_worker,
+            initargs=(db, name, pack, cache_dir)) as pool:
+        yield from pool.imap(_render, tasks, chunksize)
+
+
+class DirectoryWriter:
+    """Write rendered SVGs as files into a directory.
+
+    >>> import tempfile
+    >>> directory = os.path.join(tempfile.mkdtemp(), 'signs')
+    >>> output = DirectoryWriter(directory)
+    >>> output.write('000001.svg', '<svg/>')
+    >>> output.close()
+    >>> os.listdir(directory)
+    ['000001.svg']
+
+    """
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def write(self, filename, svg):
+        with open(os.path.join(self.path, filename), 'w') as output:
+            output.write(svg)
+
+    def close(self):
+        pass
+
+
+class TarWriter:
+    """Stream rendered SVGs into a (possibly compressed) tar archive.
+
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'signs.tar.gz')
+    >>> output = TarWriter(path)
+    >>> output.write('000001.svg', '<svg/>')
+    >>> output.write('000002.svg', '<svg></svg>')
+    >>> output.close()
+    >>> with tarfile.open(path) as archive:
+    ...     [(member.name, member.size) for member in archive]
+    [('000001.svg', 6), ('000002.svg', 11)]
+
+    """
+    def __init__(self, path):
+        compressed = path.endswith(('.tar.gz', '.tgz'))
+        self.archive = tarfile.open(path, 'w:gz' if compressed else 'w')
+        self.mtime = time.time()
+
+    def write(self, filename, svg):
+        data = svg.encode('utf-8')
+        info = tarfile.TarInfo(filename)
+        info.size = len(data)
+        info.mtime = self.mtime
+        self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.archive.close()
+
+
+class ZipWriter:
+    """Stream rendered SVGs into a zip archive.
+
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'signs.zip')
+    >>> output = ZipWriter(path)
+    >>> output.write('000001.svg', '<svg/>')
+    >>> output.close()
+    >>> with zipfile.ZipFile(path) as archive:
+    ...     archive.namelist(), archive.read('000001.svg')
+    (['000001.svg'], b'<svg/>')
+
+    """
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(
+            path, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, filename, svg):
+        self.archive.writestr(filename, svg)
+
+    def close(self):
+        self.archive.close()
+
+
+def writer(output_dir=None, archive=None):
+    """Create the writer for an output directory or archive path.
+
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> for archive in ['signs.zip', 'signs.tar', 'signs.tgz']:
+    ...     output = writer(archive=os.path.join(directory, archive))
+    ...     output.close()
+    ...     print(type(output).__name__)
+    ZipWriter
+    TarWriter
+    TarWriter
+    >>> type(writer(output_dir=directory)).__name__
+    'DirectoryWriter'
+
+    """
+    if archive is None:
+        return DirectoryWriter(output_dir)
+    elif archive.endswith('.zip'):
+        return ZipWriter(archive)
+    else:
+        return TarWriter(archive)
+
+
+def main(argv=None):
+    """Render KSW strings from a file or stdin in parallel."""
+    parser = argparse.ArgumentParser(
+        prog='swip bulk',
+        description=__doc__)
+    parser.add_argument(
+        "input",
+        nargs='?',
+        type=argparse.FileType('r'),
+        default=sys.stdin,
+        help="File with one KSW string per line (default: stdin)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument(
+        "--output-dir",
+        help="Directory to write SVG files to")
+    output.add_argument(
+        "--archive",
+        help="Tar (.tar, .tar.gz, .tgz) or zip (.zip) archive to write")
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=64,
+        help="Number of lines sent to a worker at once")
+    parser.add_argument(
+        "--errors",
+        type=argparse.FileType('w'),
+        default=sys.stderr,
+        help="File to report lines that could not be rendered to")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="The ISWA SQLite database to read from")
+    parser.add_argument(
+        "--font",
+        default="font_svg1",
+        help="The font to use")
+    parser.add_argument(
+        "--font-pack",
+        default=None,
+        help="Read glyphs from this font pack instead of the database")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get('SWIP_CACHE_DIR'),
+        help="Directory caching rendered signs (default: $SWIP_CACHE_DIR)")
+    args = parser.parse_args(argv)
+
+    output = writer(args.output_dir, args.archive)
+    rendered = failed = 0
+    start = time.perf_counter()
+    try:
+        for number, ksw_string, svg, error in render_all(
+                args.input, args.jobs, args.db, args.font, args.font_pack,
+                args.chunksize, args.cache_dir):
+            if error is None:
+                output.write('{:06d}.svg'.format(number), svg)
+                rendered += 1
+            else:
+                print('{:d}: {:s}: {:}'.format(number, ksw_string, error),
+                      file=args.errors)
+                failed += 1
+    finally:
+        output.close()
+        duration = time.perf_counter() - start
+        print('Rendered {:d} signs ({:d} errors) in {:.2f}s, '
+              '{:.1f} signs/s'.format(
+                  rendered, failed, duration,
+                  (rendered + failed) / duration if duration else 0.0),
+              file=sys.stderr)
+    return 1 if failed else 0
@@ -8,9 +8,15 @@ optional parameters) and constructs a SVG graphic for that sign.
 """
 
 from . import parser
-from .iswa_font import ISWAFont
+from .iswa_font import GlyphTemplate, ISWAFont, LRUCache
 
-DEFAULT = ISWAFont()
+# The font used when none is given, see `default_font`
+_default = None
+
+SVG = 'http://www.w3.org/2000/svg'
+SVG_TAG = '{' + SVG + '}'
+# Parsed glyph markup, see `svg_element`
+_elements = LRUCache(4096)
 
 symbol_group_color = {
     'hand': '#0000ff',
@@ -22,9 +28,132 @@ symbol_group_color = {
     'location': '#ddaa00',
     'punctuation': '#ff5500'}
 
+# The `symbol_group_color` of basic shapes, by their 'S' and three digits
+_group_colors = {}
+
+
+def default_font():
+    """Return the default font, opening it on first use.
+
+    The font database is only opened when something is rendered or
+    measured without a font, not when this module is imported. The
+    font is also available as `DEFAULT`.
+
+    >>> from swip import compose
+    >>> compose.DEFAULT is default_font()
+    True
+
+    """
+    global _default
+    if _default is None:
+        _default = ISWAFont()
+    return _default
+
+
+def __getattr__(name):
+    if name == 'DEFAULT':
+        return default_font()
+    raise AttributeError(
+        'module {:} has no attribute {:}'.format(__name__, name))
+
+
+def group_color(symbol):
+    """Return the color of the symbol group `symbol` belongs to.
+
+    >>> group_color('S14c20')
+    '#0000ff'
+
+    """
+    try:
+        return _group_colors[symbol[:4]]
+    except KeyError:
+        color = symbol_group_color[parser.symbol_type(symbol)]
+        _group_colors[symbol[:4]] = color
+        return color
+
+
+class SymbolDefs:
+    """Glyphs shared between the glyphograms of one document.
+
+    Passed as `defs` to `glyphogram`, glyphs are not inlined, but
+    referenced with `<use>` elements. Every distinct (symbol, colors)
+    glyph is recorded once, and `definitions` returns the `<defs>`
+    element defining all of them, to be included once in the document.
+
+    >>> defs = SymbolDefs()
+    >>> defs.use('10000', '#000000', '#ffffff')
+    '<use href="#S10000"/>'
+    >>> defs.use('10000', '#0000ff', '#ffffff')
+    '<use href="#S10000_0000ff_ffffff"/>'
+    >>> print(defs.definitions()) # doctest: +ELLIPSIS
+    <defs><g id="S10000"><g>
+    ...
+    </g></g><g id="S10000_0000ff_ffffff"><g>
+    ...
+    </g></g></defs>
+
+    """
+    def __init__(self, font=None):
+        self.font = default_font() if font is None else font
+        self.ids = {}
+
+    @staticmethod
+    def id(key, line='#000000', fill='#ffffff'):
+        """The id of the glyph of `key` in the given colors.
+
+        >>> SymbolDefs.id('S14c20')
+        'S14c20'
+        >>> SymbolDefs.id('14c20', '#0000ff')
+        'S14c20_0000ff_ffffff'
+
+        """
+        if not key.startswith('S'):
+            key = 'S' + key
+        if line == '#000000' and fill == '#ffffff':
+            return key
+        return '{:s}_{:s}_{:s}'.format(
+            key, line.lstrip('#'), fill.lstrip('#'))
+
+    def use(self, key, line, fill):
+        """Record the glyph and return the markup referencing it."""
+        try:
+            id = self.ids[key, line, fill]
+        except KeyError:
+            id = self.ids[key, line, fill] = self.id(key, line, fill)
+        return '<use href="#{:s}"/>'.format(id)
+
+    def definitions(self):
+        """Return a `<defs>` element with all glyphs used so far."""
+        return '<defs>{:s}</defs>'.format(''.join(
+            '<g id="{:s}">{:s}</g>'.format(
+                id, self.font.glyph(key, line, fill))
+            for (key, line, fill), id in self.ids.items()))
+
+
+class SpriteRef:
+    """Glyphs referenced from an external SVG sprite sheet.
+
+    Passed as `defs` to `glyphogram`, glyphs are referenced as symbols
+    of the sprite sheet at `url` (see `sprite.write_sprite`), which only
+    contains glyphs in their default colors.
+
+    >>> SpriteRef('sprite.svg').use('14c20', '#000000', '#ffffff')
+    '<use href="sprite.svg#S14c20"/>'
+
+    """
+    def __init__(self, url):
+        self.url = url
+
+    def use(self, key, line, fill):
+        """Return the markup referencing the glyph in the sprite sheet."""
+        if line != '#000000' or fill != '#ffffff':
+            raise ValueError('Sprite glyphs cannot be recolored')
+        return '<use href="{:s}#{:s}"/>'.format(
+            self.url, SymbolDefs.id(key))
+
 
 def glyphogram(ksw_string, pad=1, bound=None, line='#000000',
-               fill='#ffffff', colorize=False, font=DEFAULT):
+               fill='#ffffff', colorize=False, font=None, defs=None):
     """
     >>> print(glyphogram(
     ...  'M40x69S35000n18xn18S30c00n18xn18S14c2017x15S22e0420x51'))
@@ -39,10 +168,134 @@ def glyphogram(ksw_string, pad=1, bound=None, line='#000000',
         <g transform="translate(1,1)"> ...
         </g>
     </svg>
+
+    If `defs` is True, every distinct glyph is defined once at the top
+    of the SVG and referenced by `<use>` elements where it is placed. If
+    `defs` is a `SymbolDefs` object, the glyphs are only referenced, and
+    the document embedding the SVG must include `defs.definitions()`.
+    If it is a `SpriteRef`, the glyphs are referenced from a sprite
+    sheet.
+
+    >>> print(glyphogram('M18x33S1870an11x15S1870an18xn10', defs=True))
+    ... #doctest: +ELLIPSIS +NORMALIZE_WHITESPACE
+    <?xml ...
+        <svg ...>
+        <metadata>...</metadata>
+        <defs><g id="S1870a"><g>...</g></g></defs>
+        <g transform="translate(8,26)">
+            <use href="#S1870a"/>
+        </g>
+        <g transform="translate(1,1)">
+            <use href="#S1870a"/>
+        </g>
+        </svg>
     """
 
-    # Process cluster string
+    if font is None:
+        font = default_font()
     layout = parser.parse(ksw_string)
+    if defs is True:
+        defs = SymbolDefs(font)
+        return _compose(ksw_string, layout, font.name, defs.use, pad,
+                        bound, line, fill, colorize, defs.definitions)
+    elif defs is not None:
+        return _compose(ksw_string, layout, font.name, defs.use, pad,
+                        bound, line, fill, colorize)
+    return _compose(ksw_string, layout, font.name, font.glyph, pad,
+                    bound, line, fill, colorize)
+
+
+def measure(ksw_string, font=None):
+    """Return the exact bounding box of the symbols of a sign.
+
+    The box (x_min, y_min, x_max, y_max) is in the coordinates of the
+    KSW string and covers the full width and height of every symbol, as
+    recorded in the font's metrics, without loading any glyph. A sign
+    without symbols measures (0, 0, 0, 0).
+
+    >>> measure('M18x33S10000n10xn15S1000f5x3')
+    (-10, -15, 35, 24)
+
+    """
+    if font is None:
+        font = default_font()
+    return _measure(parser.parse(ksw_string), font.metrics())
+
+
+def measure_many(ksw_strings, font=None):
+    """Return the `measure` of many KSW strings, as a list.
+
+    >>> measure_many(['M5x15S10000n10xn15', 'M18x33'])
+    [(-10, -15, 5, 15), (0, 0, 0, 0)]
+
+    """
+    if font is None:
+        font = default_font()
+    metrics = font.metrics()
+    return [_measure(parser.parse(ksw_string), metrics)
+            for ksw_string in ksw_strings]
+
+
+def _measure(layout, metrics):
+    widths, heights = metrics
+    if len(layout) < 2:
+        return 0, 0, 0, 0
+    x_min = y_min = float('inf')
+    x_max = y_max = float('-inf')
+    for symbol, (x, y) in layout[1:]:
+        code = ISWAFont.code(symbol)
+        if code >= len(widths) or not widths[code]:
+            raise ValueError('No glyph for code {:d}'.format(code))
+        x_min = min(x_min, x)
+        y_min = min(y_min, y)
+        x_max = max(x_max, x + widths[code])
+        y_max = max(y_max, y + heights[code])
+    return x_min, y_min, x_max, y_max
+
+
+def glyphograms(ksw_strings, pad=1, bound=None, line='#000000',
+                fill='#ffffff', colorize=False, font=None):
+    """Construct the SVG graphics for many KSW strings.
+
+    All strings are parsed first, and the distinct symbols they use are
+    loaded from the font together, instead of one by one. The result is
+    a list of the same SVGs that `glyphogram` would produce, in input
+    order.
+
+    >>> ksw = 'M40x69S35000n18xn18S30c00n18xn18S14c2017x15S22e0420x51'
+    >>> glyphograms([ksw, 'S38800n36xn4']) == [
+    ...     glyphogram(ksw), glyphogram('S38800n36xn4')]
+    True
+
+    """
+    if font is None:
+        font = default_font()
+    ksw_strings = list(ksw_strings)
+    layouts = [parser.parse(ksw_string) for ksw_string in ksw_strings]
+    snippets = font.svg_snippets(
+        symbol for layout in layouts for symbol, _ in layout[1:])
+
+    templates = {code: GlyphTemplate(glyph)
+                 for code, (glyph, _, _) in snippets.items()}
+    glyphs = {}
+
+    def glyph(key, line, fill):
+        try:
+            return glyphs[key, line, fill]
+        except KeyError:
+            svg = templates[font.code(key)].render(line, fill)
+            glyphs[key, line, fill] = svg
+            return svg
+
+    return [
+        _compose(ksw_string, layout, font.name, glyph,
+                 pad, bound, line, fill, colorize)
+        for ksw_string, layout in zip(ksw_strings, layouts)]
+
+
+def _canvas(layout, pad, bound):
+    """Return (x_min, y_min, x_max, y_max) of the canvas of a layout."""
+    # Process cluster string
     x_max, y_max = layout[0][1]
     x_min, y_min = parser.min_coordinates(layout, False)
 
@@ -59,27 +312,42 @@ def glyphogram(ksw_string, pad=1, bound=None, line='#000000',
             x_min = -x_max
 
     # Pad with whitespace
-    x_max += pad
-    x_min -= pad
-    y_max += pad
-    y_min -= pad
+    return x_min - pad, y_min - pad, x_max + pad, y_max + pad
+
+
+def _placements(layout, x_min, y_min, line, colorize):
+    """Yield the (key, line color, x, y) of every symbol on the canvas."""
+    for symbol, (x, y) in layout[1:]:
+        yield (symbol[1:6],
+               group_color(symbol) if colorize else line,
+               x - x_min,
+               y - y_min)
+
+
+def _compose(ksw_string, layout, font_name, glyph, pad, bound, line,
+             fill, colorize, head=None):
+    """Lay out the parsed symbols of a sign on an SVG canvas.
+
+    `glyph` is a function returning the SVG group of a symbol key in
+    the given line and fill colors. `head`, if given, is a function
+    returning markup to put before the symbols, called after them.
+
+    """
+    x_min, y_min, x_max, y_max = _canvas(layout, pad, bound)
 
     # Load images and put in the right places
     images = []
-    for num, (symbol, (x, y)) in enumerate(layout):
-        if num == 0:
-            continue
-        key = symbol[1:6]
-        if colorize:
-            group = parser.symbol_type(symbol)
-            line = symbol_group_color[group]
+    for key, color, x, y in _placements(layout, x_min, y_min, line,
+                                        colorize):
         images.append("""
         <g transform="translate({x:d},{y:d})">
             {core:}
         </g>""".format(
-            x=x - x_min,
-            y=y - y_min,
-            core=font.glyph(key, line, fill)))
+            x=x,
+            y=y,
+            core=glyph(key, color, fill)))
+    if head is not None:
+        images.insert(0, head())
 
     # Insert into single SVG canvas
     svg = """<?xml version="1.0" standalone="no"?>
@@ -92,7 +360,7 @@ def glyphogram(ksw_string, pad=1, bound=None, line='#000000',
     {image:s}
     </svg>
     """.format(
-        font=font.name,
+        font=font_name,
         width=x_max - x_min,
         height=y_max - y_min,
         ksw_string=ksw_string,
@@ -100,3 +368,72 @@ def glyphogram(ksw_string, pad=1, bound=None, line='#000000',
 
     # Return
     return svg
+
+
+def svg_element(markup):
+    """Parse SVG markup without namespace into an element in the SVG one.
+
+    Elements are cached by their markup and shared between the trees
+    of `glyphogram_element`, so they must not be modified.
+
+    >>> svg_element('<use href="#S10000"/>') # doctest: +ELLIPSIS
+    <Element '{http://www.w3.org/2000/svg}use' at ...>
+
+    """
+    element = _elements.get(markup)
+    if element is None:
+        import xml.etree.ElementTree as ET
+        element = ET.fromstring(
+            '<svg xmlns="{:s}">{:s}</svg>'.format(SVG, markup))[0]
+        _elements.put(markup, element)
+    return element
+
+
+def glyphogram_element(ksw_string, pad=1, bound=None, line='#000000',
+                       fill='#ffffff', colorize=False, font=None,
+                       defs=None):
+    """Construct the SVG graphic for a KSW string as an element tree.
+
+    Takes the same arguments as `glyphogram` and describes the same
+    graphic, but returns the `<svg>` element, ready to be inserted into
+    other ElementTree documents without serializing and parsing it.
+    The glyph subtrees are shared between calls (see `svg_element`).
+
+    >>> import xml.etree.ElementTree as ET
+    >>> svg = glyphogram_element('M18x33S1870an11x15S1870an18xn10')
+    >>> svg.get('width'), svg.get('height')
+    ('38.000000', '45.000000')
+    >>> [child.get('transform') for child in svg[1:]]
+    ['translate(8,26)', 'translate(1,1)']
+    >>> ET.tostring(svg[1][0]) == ET.tostring(svg_element(
+    ...     default_font().glyph('1870a')))
+    True
+
+    """
+    import xml.etree.ElementTree as ET
+    if font is None:
+        font = default_font()
+    layout = parser.parse(ksw_string)
+    head = None
+    if defs is True:
+        defs = SymbolDefs(font)
+        head = defs.definitions
+    glyph = font.glyph if defs is None else defs.use
+
+    x_min, y_min, x_max, y_max = _canvas(layout, pad, bound)
+    svg = ET.Element(SVG_TAG + 'svg', {
+        'version': '1.0',
+        'width': '{:f}'.format(x_max - x_min),
+        'height': '{:f}'.format(y_max - y_min)})
+    ET.SubElement(svg, SVG_TAG + 'metadata').text = (
+        "Generated with SWIP using Valerie Sutton's ISWA 2010 symbols "
+        "({:}) {:s}".format(font.name, ksw_string))
+    for key, color, x, y in _placements(layout, x_min, y_min, line,
+                                        colorize):
+        ET.SubElement(svg, SVG_TAG + 'g', {
+            'transform': 'translate({:d},{:d})'.format(x, y)}).append(
+                svg_element(glyph(key, color, fill)))
+    if head is not None:
+        svg.insert(1, ET.fromstring(
+            '<svg xmlns="{:s}">{:s}</svg>'.format(SVG, head()))[0])
+    return svg
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+"""convert: Convert between raw, expanded and layouted KSW strings
+
+Raw Kartesian SignWriting only places symbols. Expanded KSW also gives
+the size of every symbol (S1000015x30xn10xn15), and layouted KSW gives
+the maximum coordinates of every sign instead (M5x15S10000n10xn15), so
+that consumers of these forms never need a font. Converting raw KSW to
+either form reads symbol sizes from the metrics of a font, which are
+loaded once; converting back only drops information.
+
+Punctuation is placed with its center at the origin in layouted KSW,
+and carries no coordinates in raw and expanded KSW.
+
+"""
+
+import re
+import sys
+import argparse
+
+from . import parser
+from .parser import swnumber_string
+from .compose import default_font
+from .font_pack import PackedFont
+from .iswa_font import ISWAFont
+
+RAW, EXPANDED, LAYOUTED = FORMS = ('raw', 'expanded', 'layouted')
+
+# The forms of a token, in the order of preference of `parser.is_raw`
+# etc., with their token patterns
+_TOKENS = (
+    (RAW, parser.RAW_TOKEN),
+    (EXPANDED, parser.EXPANDED_TOKEN),
+    (LAYOUTED, parser.LAYOUT_TOKEN))
+
+_PREFIX = '(A(?:' + parser.SYMBOL_BLOCK + ')+)?'
+_WORD = re.compile(
+    _PREFIX + '([BLMR])(?:[0-9]+x[0-9]+)?(.*)',
+    flags=re.IGNORECASE)
+_PUNCTUATION = re.compile(
+    _PREFIX + '(' + parser.re_punc + ')(?:[0-9n]+x[0-9n]+)?',
+    flags=re.IGNORECASE)
+_SYMBOL = re.compile(
+    '(' + parser.SYMBOL_BLOCK + ')'
+    '(?:[0-9]+x[0-9]+x)?(n?[0-9]+)x(n?[0-9]+)',
+    flags=re.IGNORECASE)
+_WORD_TOKEN = re.compile(r'\S+')
+
+
+def form(token):
+    """Return the form of a single KSW token, or raise ValueError.
+
+    >>> form('MS10000n10xn15')
+    'raw'
+    >>> form('MS1000015x30xn10xn15')
+    'expanded'
+    >>> form('M5x15S10000n10xn15')
+    'layouted'
+
+    """
+    for name, pattern in _TOKENS:
+        if pattern.fullmatch(token):
+            return name
+    raise ValueError('Not a raw, expanded or layouted KSW string: {:}'
+                     .format(token))
+
+
+class Converter:
+    """Convert KSW strings between forms, using the sizes of `font`.
+
+    >>> converter = Converter()
+    >>> converter.convert('MS10000n10xn15S1000f5x3', 'expanded')
+    'MS1000015x30xn10xn15S1000f30x21x5x3'
+    >>> converter.convert('MS10000n10xn15S1000f5x3', 'layouted')
+    'M35x24S10000n10xn15S1000f5x3'
+    >>> converter.convert('M35x24S10000n10xn15S1000f5x3 S38800', 'raw')
+    'MS10000n10xn15S1000f5x3 S38800'
+    >>> converter.convert('AS10000MS1000015x30xn10xn15', 'layouted')
+    'AS10000M5x15S10000n10xn15'
+
+    Signs that end left of or above the origin get maxima of 0, so that
+    the result is still layouted KSW and converts back:
+
+    >>> converter.convert('MS10000n40xn50', 'layouted')
+    'M0x0S10000n40xn50'
+    >>> converter.convert(converter.convert('MS10000n40xn50', 'layouted'),
+    ...                   'raw')
+    'MS10000n40xn50'
+
+    Punctuation is centered when layouted:
+
+    >>> converter.convert('S38800', 'layouted')
+    'S38800n13xn8'
+    >>> converter.convert('S38800n13xn8', 'expanded')
+    'S3880027x16'
+
+    """
+    def __init__(self, font=None):
+        if font is None:
+            font = default_font()
+        self.font = font
+        # Load all symbol sizes up front
+        self.size = font.size
+        font.metrics()
+
+    def convert_token(self, token, to):
+        """Convert one (whitespace-free) KSW token to the form `to`."""
+        if to not in FORMS:
+            raise ValueError('Unknown KSW form: {:}'.format(to))
+        source = form(token)
+        if source == to:
+            return token
+
+        punctuation = _PUNCTUATION.fullmatch(token)
+        if punctuation:
+            prefix, symbol = punctuation.groups()
+            prefix = prefix or ''
+            if to == RAW:
+                return prefix + symbol
+            w, h = self.size(symbol)
+            if to == EXPANDED:
+                return '{:s}{:s}{:d}x{:d}'.format(prefix, symbol, w, h)
+            return '{:s}{:s}{:s}x{:s}'.format(
+                prefix, symbol, swnumber_string(-(w // 2)),
+                swnumber_string(-(h // 2)))
+
+        prefix, lane, body = _WORD.fullmatch(token).groups()
+        symbols = [(symbol, int(x.replace('n', '-')),
+                    int(y.replace('n', '-')))
+                   for symbol, x, y in _SYMBOL.findall(body)]
+        if to == RAW:
+            return (prefix or '') + lane + ''.join(
+                '{:s}{:s}x{:s}'.format(
+                    symbol, swnumber_string(x), swnumber_string(y))
+                for symbol, x, y in symbols)
+        if to == EXPANDED:
+            parts = [prefix or '', lane]
+            for symbol, x, y in symbols:
+                w, h = self.size(symbol)
+                parts.append('{:s}{:d}x{:d}x{:s}x{:s}'.format(
+                    symbol, w, h, swnumber_string(x), swnumber_string(y)))
+            return ''.join(parts)
+
+        # Layouted: the lane with the maximum coordinates of all symbols,
+        # which cannot be negative in KSW
+        max_x = max_y = 0
+        for symbol, x, y in symbols:
+            w, h = self.size(symbol)
+            max_x = max(max_x, x + w)
+            max_y = max(max_y, y + h)
+        return '{:s}{:s}{:s}x{:s}'.format(
+            prefix or '', lane, swnumber_string(max_x),
+            swnumber_string(max_y)) + ''.join(
+                '{:s}{:s}x{:s}'.format(
+                    symbol, swnumber_string(x), swnumber_string(y))
+                for symbol, x, y in symbols)
+
+    def convert(self, text, to):
+        """Convert every token of `text` to the form `to`.
+
+        Whitespace between the tokens is kept as it is.
+
+        """
+        return _WORD_TOKEN.sub(
+            lambda match: self.convert_token(match.group(0), to), text)
+
+    def convert_lines(self, lines, to, errors='raise'):
+        """Convert an iterable of lines, yielding (line, error) pairs.
+
+        If `errors` is 'raise', a line that cannot be converted raises
+        a ValueError. If it is 'ignore', it is yielded unchanged, along
+        with the error; the error of converted lines is None.
+
+        """
+        if errors not in ('raise', 'ignore'):
+            raise ValueError('Unknown error handling: {:}'.format(errors))
+        for line in lines:
+            try:
+                yield self.convert(line, to), None
+            except ValueError as error:
+                if errors == 'raise':
+                    raise
+                yield line, error
+
+
+def main(argv=None):
+    """Convert a file of KSW strings, one or more per line."""
+    parser = argparse.ArgumentParser(
+        prog='swip convert',
+        description=__doc__)
+    parser.add_argument(
+        "input",
+        type=argparse.FileType('r'),
+        help="The file of KSW strings to convert (- for standard input)")
+    parser.add_argument(
+        "--to",
+        choices=FORMS,
+        required=True,
+        help="The form to convert to")
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType('w'),
+        default=sys.stdout,
+        help="The file to write output to")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="The ISWA SQLite database to read symbol sizes from")
+    parser.add_argument(
+        "--font",
+        default="font_svg1",
+        help="The font to use")
+    parser.add_argument(
+        "--font-pack",
+        default=None,
+        help="Read symbol sizes from this font pack instead")
+    args = parser.parse_args(argv)
+
+    if args.font_pack:
+        font = PackedFont(args.font_pack)
+    else:
+        font = ISWAFont(db=args.db, name=args.font)
+    converter = Converter(font)
+    failures = 0
+    for number, (line, error) in enumerate(
+            converter.convert_lines(args.input, args.to, 'ignore'), 1):
+        if error is not None:
+            failures += 1
+            print('{:d}: {:}'.format(number, error), file=sys.stderr)
+        args.output.write(line)
+    return 1 if failures else 0
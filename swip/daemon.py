@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+"""daemon: Keep fonts warm for the swip CLI behind a Unix socket
+
+`swip daemon` listens on a local Unix socket and renders signs for
+`swip KSW_STRING`, which sends its request there when the daemon runs
+and renders in-process when it does not, so that scripts rendering one
+sign per call do not open the font and load glyphs every time. The
+socket is $SWIP_SOCKET, or swip.sock in $XDG_RUNTIME_DIR (or in a
+private directory swip-UID in the temporary directory).
+
+Every connection carries one request, the options of `swip` separated
+by NUL characters, and its response, '+' followed by the SVG or '-'
+followed by an error message. Clients only import `os`, `stat` and
+`socket`, and only talk to a socket owned by their user in a directory
+no other user can write to.
+
+"""
+
+import os
+import sys
+import stat
+import socket
+
+# How long a client waits for the daemon before rendering by itself
+TIMEOUT = 10
+
+
+def socket_path():
+    """Return the path of the daemon socket for this user."""
+    path = os.environ.get('SWIP_SOCKET')
+    if path:
+        return path
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if not directory:
+        # The temporary directory is shared, so use a private one in it
+        directory = os.path.join(
+            os.environ.get('TMPDIR', '/tmp'),
+            'swip-{:d}'.format(os.getuid()))
+    return os.path.join(directory, 'swip.sock')
+
+
+def is_private(path, kind=stat.S_ISSOCK):
+    """Whether `path` is of `kind`, owned and only writable by this user.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     is_private(directory, stat.S_ISDIR)
+    True
+    >>> is_private('/tmp', stat.S_ISDIR)
+    False
+
+    """
+    try:
+        status = os.lstat(path)
+    except OSError:
+        return False
+    return (kind(status.st_mode) and status.st_uid == os.getuid()
+            and not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+
+def is_trusted(path):
+    """Whether the socket `path` can only have been made by this user."""
+    return is_private(path) and is_private(
+        os.path.dirname(os.path.abspath(path)), stat.S_ISDIR)
+
+
+def request(ksw_string, font='font_svg1', font_pack=None, sprite=None,
+            cache_dir=None, path=None, timeout=TIMEOUT):
+    """Ask the daemon to render a sign, returning the SVG or None.
+
+    The options are those of `swip`. None is returned if no daemon is
+    listening at `path` (default: `socket_path()`), if the socket is
+    not `is_trusted`, or if the daemon could not render the sign.
+
+    """
+    if path is None:
+        path = socket_path()
+    if not is_trusted(path):
+        return None
+    message = '\0'.join([
+        ksw_string, font,
+        os.path.abspath(font_pack) if font_pack else '',
+        sprite or '',
+        os.path.abspath(cache_dir) if cache_dir else ''])
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(path)
+            client.sendall(message.encode('utf-8'))
+            client.shutdown(socket.SHUT_WR)
+            response = b''.join(iter(lambda: client.recv(1 << 16), b''))
+    except OSError:
+        return None
+    if not response.startswith(b'+'):
+        return None
+    return response[1:].decode('utf-8')
+
+
+class RenderDaemon:
+    """Render signs for `swip` clients, keeping fonts and caches open.
+
+    >>> daemon = RenderDaemon()
+    >>> svg = daemon.render('M18x33S1870an11x15')
+    >>> from swip.compose import glyphogram
+    >>> svg == glyphogram('M18x33S1870an11x15')
+    True
+
+    """
+    def __init__(self):
+        self.fonts = {}
+        self.caches = {}
+        self.requests = 0
+
+    def font(self, name, font_pack):
+        """Return the font `name` or pack, opening it on first use."""
+        try:
+            return self.fonts[name, font_pack]
+        except KeyError:
+            if font_pack:
+                from .font_pack import PackedFont
+                font = PackedFont(font_pack)
+            else:
+                from .iswa_font import ISWAFont
+                font = ISWAFont(name=name)
+            self.fonts[name, font_pack] = font
+            return font
+
+    def render(self, ksw_string, font='font_svg1', font_pack=None,
+               sprite=None, cache_dir=None):
+        """Render a sign like `swip` would with the given options."""
+        from .compose import SpriteRef, glyphogram
+        self.requests += 1
+        font = self.font(font, font_pack)
+        if cache_dir and not sprite:
+            try:
+                cache = self.caches[cache_dir]
+            except KeyError:
+                from .render_cache import RenderCache
+                cache = self.caches[cache_dir] = RenderCache(cache_dir)
+            return cache.glyphogram(ksw_string, font=font)
+        return glyphogram(
+            ksw_string,
+            font=font,
+            defs=SpriteRef(sprite) if sprite else None)
+
+    async def handle(self, reader, writer):
+        """Answer the request of one client."""
+        try:
+            ksw_string, font, font_pack, sprite, cache_dir = (
+                await reader.read()).decode('utf-8').split('\0')
+            response = b'+' + self.render(
+                ksw_string, font, font_pack or None, sprite or None,
+                cache_dir or None).encode('utf-8')
+        except Exception as error:
+            response = '-{:}: {:}'.format(
+                type(error).__name__, error).encode('utf-8')
+        try:
+            writer.write(response)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path):
+        """Accept connections on the socket `path` until cancelled.
+
+        The daemon is also cancelled by SIGTERM, and removes the socket.
+
+        """
+        import signal
+        import asyncio
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, asyncio.current_task().cancel)
+        # Only this user may connect
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path)
+        finally:
+            os.umask(umask)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+def main(argv=None):
+    """Run the render daemon."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='swip daemon',
+        description=__doc__)
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="The socket to listen on (default: {:s})".format(
+            socket_path()))
+    args = parser.parse_args(argv)
+
+    import asyncio
+    path = args.socket or socket_path()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not is_private(directory, stat.S_ISDIR):
+        parser.error('Not a private directory of this user: ' + directory)
+    if os.path.lexists(path):
+        if not is_private(path):
+            parser.error('Not a socket of this user: ' + path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except OSError:
+                # Left behind by a daemon that did not shut down cleanly
+                os.unlink(path)
+            else:
+                parser.error('A daemon is already listening on ' + path)
+    print('Listening on {:s}'.format(path), file=sys.stderr)
+    try:
+        asyncio.run(RenderDaemon().serve(path))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
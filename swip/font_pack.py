@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+"""font_pack: Compact binary ISWA font files
+
+A font pack contains a single font table of an ISWA database, as a
+fixed-size index of glyph offsets and sizes followed by the UTF-8
+glyph data. `PackedFont` memory-maps such a file and can be used
+wherever an `ISWAFont` is expected, without touching SQLite.
+
+"""
+
+import os
+import sys
+import mmap
+import struct
+import argparse
+from array import array
+
+from .iswa_font import ISWAFont, LRUCache
+
+MAGIC = b'SWIPPAK1'
+# Magic, number of index slots, length of the font name
+HEADER = struct.Struct('<8sIH')
+# Offset into the glyph data, length of the glyph data, width, height
+ENTRY = struct.Struct('<IIHH')
+
+
+def write_pack(font, output):
+    """Write all glyphs of `font` to the binary file `output`.
+
+    Return the number of glyphs written.
+
+    """
+    snippets = list(font.iter_snippets())
+    slots = 1 + max((code for code, _, _, _ in snippets), default=0)
+    name = font.name.encode('utf-8')
+
+    index = bytearray(ENTRY.size * slots)
+    data = bytearray()
+    for code, glyph, w, h in snippets:
+        encoded = glyph.encode('utf-8')
+        ENTRY.pack_into(index, ENTRY.size * code, len(data), len(encoded),
+                        w, h)
+        data += encoded
+
+    output.write(HEADER.pack(MAGIC, slots, len(name)))
+    output.write(name)
+    output.write(index)
+    output.write(data)
+    return len(snippets)
+
+
+class PackedFont(ISWAFont):
+    """An ISWA font read from a memory-mapped font pack.
+
+    Glyphs are decoded from the mapped file when they are first
+    requested, so processes using the same pack share its pages.
+
+    """
+    def __init__(self, path, cache_size=1024):
+        self.path = path
+        with open(path, 'rb') as pack:
+            self.map = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        magic, self.slots, name_length = HEADER.unpack_from(self.view)
+        if magic != MAGIC:
+            raise ValueError('Not a SWIP font pack: {:}'.format(path))
+        self.index_start = HEADER.size + name_length
+        self.data_start = self.index_start + ENTRY.size * self.slots
+        self.name = str(self.view[HEADER.size:self.index_start], 'utf-8')
+        self.snippets = LRUCache(cache_size)
+        self.templates = LRUCache(cache_size)
+        self.glyphs = LRUCache(cache_size)
+        self.queries = 0
+        self._metrics = None
+
+    def identity(self):
+        """Identify the pack file, changing whenever the file changes."""
+        stat = os.stat(self.path)
+        return '{:s}:{:d}:{:d}'.format(
+            os.path.abspath(self.path), stat.st_size, stat.st_mtime_ns)
+
+    def load_snippet(self, code):
+        """Decode the glyph, width and height of `code` from the pack."""
+        if not 0 < code < self.slots:
+            raise ValueError('No glyph for code {:d}'.format(code))
+        offset, length, w, h = ENTRY.unpack_from(
+            self.view, self.index_start + ENTRY.size * code)
+        if not length:
+            raise ValueError('No glyph for code {:d}'.format(code))
+        start = self.data_start + offset
+        return str(self.view[start:start + length], 'utf-8'), w, h
+
+    def load_metrics(self):
+        """Read the width and height of every symbol from the pack index."""
+        widths = array('H', bytes(2 * self.slots))
+        heights = array('H', bytes(2 * self.slots))
+        index = self.view[self.index_start:self.data_start]
+        for code, (_, length, w, h) in enumerate(ENTRY.iter_unpack(index)):
+            if length:
+                widths[code] = w
+                heights[code] = h
+        return widths, heights
+
+    def load_snippets(self, codes):
+        """Decode glyphs, widths and heights of many codes from the pack."""
+        return {code: self.load_snippet(code) for code in codes}
+
+    def iter_snippets(self):
+        """Iterate over (code, glyph, w, h) of all glyphs in the pack."""
+        for code in range(1, self.slots):
+            try:
+                yield (code,) + self.load_snippet(code)
+            except ValueError:
+                continue
+
+    def close(self):
+        """Release the memory map."""
+        self.view.release()
+        self.map.close()
+
+
+def main(argv=None):
+    """Compile a font table from an ISWA database into a font pack."""
+    parser = argparse.ArgumentParser(
+        prog='swip font-pack',
+        description=main.__doc__)
+    parser.add_argument(
+        "output",
+        type=argparse.FileType('wb'),
+        help="The font pack file to write.")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="The ISWA SQLite database to read from")
+    parser.add_argument(
+        "--font",
+        default="font_svg1",
+        help="The font table to pack")
+    args = parser.parse_args(argv)
+
+    count = write_pack(ISWAFont(db=args.db, name=args.font), args.output)
+    args.output.close()
+    print('Packed {:d} glyphs of {:s} into {:s}'.format(
+        count, args.font, args.output.name), file=sys.stderr)
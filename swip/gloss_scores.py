@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+"""gloss_scores: Concurrent word frequency lookup for glosses
+
+Glosses are scored by their word frequency according to Datamuse.
+Multi-word glosses (separated by spaces or hyphens) also get the mean
+frequency of their parts. `score_glosses` looks up every distinct word
+once, in a pool of threads, and writes results through to an SQLite
+`ScoreCache` as soon as they arrive, so interrupted runs lose nothing.
+
+"""
+
+import sys
+import sqlite3
+
+DICTAPI_URL = "https://api.datamuse.com/words?sp={:}&md=f"
+
+
+def parts(gloss):
+    """Split a multi-word gloss into its parts.
+
+    >>> parts('apple juice')
+    ['apple', 'juice']
+    >>> parts('apple-juice')
+    ['apple', 'juice']
+    >>> parts('apple')
+    []
+
+    """
+    if ' ' in gloss:
+        return gloss.split(" ")
+    elif '-' in gloss:
+        return gloss.split("-")
+    return []
+
+
+def fetch_frequency(word, url=DICTAPI_URL):
+    """Look up the frequency of exactly `word`, or None if unknown."""
+    # Imported here, because urllib (and json) are slow to import and
+    # only needed when something is actually looked up
+    import json
+    from urllib.request import urlopen
+    from urllib.parse import quote_plus
+    parsed = json.loads(
+        urlopen(url.format(quote_plus(word))).read().decode('utf-8'))
+    if not parsed or parsed[0]["word"] != word.lower():
+        return None
+    return float([
+        f for f in parsed[0]['tags']
+        if f.startswith('f:')][0][2:])
+
+
+def combine(gloss, frequencies):
+    """Score `gloss` from the looked-up frequencies of it and its parts.
+
+    The score is the frequency of the gloss itself or the mean score of
+    its parts, whichever is higher, or None if neither is known.
+
+    >>> combine('apple-juice', {'apple-juice': None,
+    ...                         'apple': 19.0, 'juice': 17.0})
+    18.0
+    >>> combine('apple', {'apple': 19.0})
+    19.0
+    >>> combine('qwxz', {'qwxz': None}) is None
+    True
+
+    """
+    freq = None
+    split = parts(gloss)
+    if split:
+        freq = sum(combine(part, frequencies) or 0.0
+                   for part in split) / len(split)
+    this_freq = frequencies[gloss]
+    if this_freq is None:
+        return freq
+    return this_freq if not freq or this_freq > freq else freq
+
+
+def words(gloss):
+    """List the gloss and all (nested) parts that need looking up.
+
+    >>> words('apple juice-box')
+    ['apple juice-box', 'apple', 'juice-box', 'juice', 'box']
+
+    """
+    needed = [gloss]
+    for part in parts(gloss):
+        needed.extend(words(part))
+    return needed
+
+
+class ScoreCache:
+    """A persistent SQLite cache of looked-up word frequencies.
+
+    Unknown words are stored with a frequency of NULL, so that they are
+    not looked up again either.
+
+    >>> cache = ScoreCache()
+    >>> cache['apple'] = 19.3
+    >>> cache['qwxz'] = None
+    >>> cache['apple'], cache['qwxz'], 'juice' in cache
+    (19.3, None, False)
+
+    """
+    def __init__(self, path=':memory:'):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS frequency '
+            '(word TEXT PRIMARY KEY, frequency REAL)')
+        self.conn.commit()
+
+    def __contains__(self, word):
+        return self.conn.execute(
+            'SELECT 1 FROM frequency WHERE word = ?',
+            (word,)).fetchone() is not None
+
+    def __getitem__(self, word):
+        row = self.conn.execute(
+            'SELECT frequency FROM frequency WHERE word = ?',
+            (word,)).fetchone()
+        if row is None:
+            raise KeyError(word)
+        return row[0]
+
+    def __setitem__(self, word, frequency):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO frequency VALUES (?, ?)',
+            (word, frequency))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def score_glosses(glosses, cache=None, workers=8, url=DICTAPI_URL):
+    """Score many glosses, looking up distinct words concurrently.
+
+    Return a dict mapping each gloss to its score (see `combine`).
+    Words already in `cache` are not looked up; new results are added
+    to it as they arrive. Words that cannot be looked up because of
+    network errors are reported and score as unknown, but not cached.
+    On KeyboardInterrupt, the lookups not yet started are cancelled,
+    and the interrupt is raised again once completed ones are cached.
+
+    >>> import json
+    >>> import threading
+    >>> from http.server import HTTPServer, BaseHTTPRequestHandler
+    >>> from urllib.parse import urlparse, parse_qs
+    >>> class Datamuse(BaseHTTPRequestHandler):
+    ...     data = {'apple': 19.0, 'juice': 17.0}
+    ...     def do_GET(self):
+    ...         word = parse_qs(urlparse(self.path).query)['sp'][0]
+    ...         body = [{'word': word, 'score': 1,
+    ...                  'tags': ['f:{:}'.format(self.data[word])]}
+    ...                 ] if word in self.data else []
+    ...         self.send_response(200)
+    ...         self.end_headers()
+    ...         self.wfile.write(json.dumps(body).encode('utf-8'))
+    ...     def log_message(self, *args):
+    ...         pass
+    >>> server = HTTPServer(('127.0.0.1', 0), Datamuse)
+    >>> thread = threading.Thread(target=server.serve_forever)
+    >>> thread.start()
+    >>> url = 'http://127.0.0.1:{:d}/words?sp={{:}}&md=f'.format(
+    ...     server.server_port)
+    >>> cache = ScoreCache()
+    >>> score_glosses(['apple-juice', 'apple', 'qwxz'], cache, url=url)
+    {'apple-juice': 18.0, 'apple': 19.0, 'qwxz': None}
+    >>> cache['juice']
+    17.0
+    >>> server.shutdown()
+    >>> thread.join()
+
+    """
+    if cache is None:
+        cache = ScoreCache()
+    glosses = list(dict.fromkeys(glosses))
+    needed = dict.fromkeys(
+        word for gloss in glosses for word in words(gloss))
+
+    frequencies = {}
+    missing = []
+    for word in needed:
+        try:
+            frequencies[word] = cache[word]
+        except KeyError:
+            missing.append(word)
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from urllib.error import URLError
+
+    def store(word, future):
+        try:
+            frequencies[word] = cache[word] = future.result()
+        except (URLError, OSError, ValueError) as error:
+            print('Could not look up {:}: {:}'.format(word, error),
+                  file=sys.stderr)
+            frequencies[word] = None
+
+    pool = ThreadPoolExecutor(workers)
+    futures = {pool.submit(fetch_frequency, word, url): word
+               for word in missing}
+    try:
+        for future in as_completed(futures):
+            store(futures[future], future)
+    except KeyboardInterrupt:
+        # Drop the queued lookups instead of waiting for them, but keep
+        # the results that have arrived in the meantime
+        pool.shutdown(wait=False, cancel_futures=True)
+        for future, word in futures.items():
+            if (word not in frequencies and future.done()
+                    and not future.cancelled()):
+                store(word, future)
+        raise
+    pool.shutdown()
+
+    return {gloss: combine(gloss, frequencies) for gloss in glosses}
@@ -8,23 +8,238 @@ from their location in an SQLite3 database.
 """
 
 import os
+import re
 import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
 
 LICENSE = "MIT"
 AUTHORS = ["G. A. Kaiping <g.a.kaiping@hum.leidenuniv.nl>"]
 COPYRIGHT = "Copyright (c) 2017 Gereon Kaiping"
 
+# The ISWA database shipped with swip
+DEFAULT_DB = os.path.join(os.path.dirname(__file__), 'iswa.sql3')
+
+# Number of codes looked up per `IN (...)` query, below SQLite's limit
+# on bound parameters
+BATCH_SIZE = 500
+
+
+# The default line and fill colors of glyphs in the database
+COLORS = re.compile('(#000000|#ffffff)')
+
+
+class GlyphTemplate:
+    """A glyph, split into segments around its line and fill colors.
+
+    Rendering the template in other colors only joins the prebuilt
+    segments with the new colors, instead of searching the glyph.
+
+    >>> template = GlyphTemplate(
+    ...     '<rect fill="#000000"/><rect fill="#ffffff"/>')
+    >>> template.render('#0000ff', '#00ffff')
+    '<rect fill="#0000ff"/><rect fill="#00ffff"/>'
+
+    """
+    __slots__ = ('parts', 'lines', 'fills')
+
+    def __init__(self, svg):
+        self.parts = COLORS.split(svg)
+        self.lines = [i for i in range(1, len(self.parts), 2)
+                      if self.parts[i] == '#000000']
+        self.fills = [i for i in range(1, len(self.parts), 2)
+                      if self.parts[i] == '#ffffff']
+
+    def render(self, line='#000000', fill='#ffffff'):
+        """Return the glyph with the given line and fill colors."""
+        parts = self.parts[:]
+        for i in self.lines:
+            parts[i] = line
+        for i in self.fills:
+            parts[i] = fill
+        return ''.join(parts)
+
+
+def read_only_uri(path):
+    """Return the SQLite URI opening `path` read-only.
+
+    >>> read_only_uri('/fonts/iswa #2.sql3')
+    'file:/fonts/iswa%20%232.sql3?mode=ro'
+
+    """
+    path = os.path.abspath(path)
+    for character in '% ?#':
+        path = path.replace(character, '%{:02X}'.format(ord(character)))
+    return 'file:{:s}?mode=ro'.format(path)
+
+
+def font_names(db=None):
+    """Return the names of the fonts (glyph tables) in an ISWA database.
+
+    >>> font_names()
+    ['font_svg1']
+
+    """
+    with sqlite3.connect(read_only_uri(db or DEFAULT_DB), uri=True) as conn:
+        tables = [name for name, in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")]
+        return sorted(
+            table for table in tables
+            if 'glyph' in [column[1] for column in conn.execute(
+                'PRAGMA table_info("{:s}")'.format(
+                    table.replace('"', '""')))])
+
+
+def recolor(svg, line='#000000', fill='#ffffff'):
+    """Replace the default line and fill colors of a glyph.
+
+    >>> recolor('<rect fill="#000000"/><rect fill="#ffffff"/>',
+    ...         line='#ffffff', fill='#ff0000')
+    '<rect fill="#ffffff"/><rect fill="#ff0000"/>'
+
+    """
+    return GlyphTemplate(svg).render(line, fill)
+
+
+class LRUCache:
+    """A bounded mapping that forgets the least recently used items.
+
+    Lookups and insertions are counted, so that the effectiveness of
+    the cache can be monitored. The cache can be shared between threads.
+
+    >>> cache = LRUCache(2)
+    >>> cache.put('a', 1)
+    >>> cache.put('b', 2)
+    >>> cache.get('a')
+    1
+    >>> cache.put('c', 3)
+    >>> 'b' in cache
+    False
+    >>> cache.get('b') is None
+    True
+    >>> cache.stats()
+    {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 1}
+
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, marking it recently used."""
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting the oldest entries if needed."""
+        if not self.maxsize:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached entries and reset the counters."""
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return the size and hit/miss/eviction counters as a dict."""
+        return {
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions}
+
 
 class ISWAFont:
-    """A class encapsulating an ISWA font database connection."""
-    def __init__(self, db=None, name="font_svg1"):
+    """A class encapsulating an ISWA font database connection.
+
+    Glyphs loaded from the database are kept in LRU caches of
+    `cache_size` entries, as raw snippets (by database code), compiled
+    into recolorable templates (by key) and recolored (by key, line and
+    fill color). A `cache_size` of 0 disables caching.
+
+    A font can be shared between threads: every thread queries the
+    database through its own read-only connection, and all of them
+    share the caches.
+
+    """
+    def __init__(self, db=None, name="font_svg1", cache_size=1024):
         if db is None:
-            db = os.path.join(
-                os.path.dirname(__file__),
-                'iswa.sql3')
-        conn = sqlite3.connect(db)
+            db = DEFAULT_DB
+        self.db = db
         self.name = name
-        self.c = conn.cursor()
+        # WARNING: This is in theory able to run HAVOC with the
+        # database, because poor database design means we need to
+        # handle IN PRINCIPLE ARBITRAY TABLE NAMES. The connections
+        # are read-only, though.
+        self._snippet_query = (
+            'SELECT glyph, w, h FROM {name:s}, symbol '
+            'WHERE {name:s}.code = ? '
+            'AND symbol.code = ?').format(name=name)
+        self._local = threading.local()
+        self.snippets = LRUCache(cache_size)
+        self.templates = LRUCache(cache_size)
+        self.glyphs = LRUCache(cache_size)
+        self.lock = threading.Lock()
+        self.queries = 0
+        self._metrics = None
+
+    @property
+    def connection(self):
+        """The read-only connection of the current thread to the font.
+
+        The database is opened read-only, but not as immutable, so that
+        the connection sees changes to the file, like `identity` does.
+
+        >>> iswa = ISWAFont()
+        >>> iswa.connection is iswa.connection
+        True
+        >>> import threading
+        >>> connections = []
+        >>> thread = threading.Thread(
+        ...     target=lambda: connections.append(iswa.connection))
+        >>> thread.start(); thread.join()
+        >>> connections[0] is iswa.connection
+        False
+
+        """
+        try:
+            return self._local.connection
+        except AttributeError:
+            connection = self._local.connection = sqlite3.connect(
+                read_only_uri(self.db), uri=True)
+            return connection
+
+    def identity(self):
+        """Identify the font file, changing whenever the file changes."""
+        stat = os.stat(self.db)
+        return '{:s}:{:d}:{:d}'.format(
+            os.path.abspath(self.db), stat.st_size, stat.st_mtime_ns)
 
     @staticmethod
     def code(symbol_key):
@@ -49,6 +264,20 @@ class ISWAFont:
             (int(symbol_key[0:3], 16) - 256) * 96 +
             int(symbol_key[3:5], 16))
 
+    @staticmethod
+    def key(code):
+        """Create the symbol key from an internal database code.
+
+        >>> ISWAFont.key(1)
+        'S10000'
+        >>> ISWAFont.key(16)
+        'S1000f'
+        >>> ISWAFont.key(ISWAFont.code('S38b5f'))
+        'S38b5f'
+        """
+        base, variation = divmod(code - 1, 96)
+        return 'S{:03x}{:02x}'.format(base + 256, variation)
+
     def svg_snippet(self, symbol):
         """Get an SVG glyph snippet from the database.
 
@@ -59,18 +288,183 @@ class ISWAFont:
         (30, 21)
 
         """
-        # WARNING: This function is in theory able to run HAVOC with
-        # the database, because poor database design means we need to
-        # handle IN PRINCIPLE ARBITRAY TABLE NAMES.
+        code = self.code(symbol)
+        snippet = self.snippets.get(code)
+        if snippet is None:
+            snippet = self.load_snippet(code)
+            self.snippets.put(code, snippet)
+        return snippet
+
+    def count_query(self):
+        """Count a query to the database, from any thread."""
+        with self.lock:
+            self.queries += 1
+
+    def load_snippet(self, code):
+        """Load the glyph, width and height of `code` from the database."""
+        self.count_query()
+        row = self.connection.execute(
+            self._snippet_query, (code, code)).fetchone()
+        if row is None:
+            raise ValueError('No glyph for code {:d}'.format(code))
+        glyph, w, h = row
+        return glyph, w, h
+
+    def load_snippets(self, codes):
+        """Load glyphs, widths and heights of many codes from the database.
+
+        Return a dict mapping codes to (glyph, w, h), using one query
+        per `BATCH_SIZE` codes.
+
+        """
+        # WARNING: Arbitrary table names, see `__init__`.
+        codes = list(codes)
+        snippets = {}
+        for start in range(0, len(codes), BATCH_SIZE):
+            batch = codes[start:start + BATCH_SIZE]
+            query = (
+                'SELECT {name:s}.code, glyph, w, h FROM {name:s}, symbol '
+                'WHERE {name:s}.code = symbol.code '
+                'AND {name:s}.code IN ({params:s})').format(
+                    name=self.name, params=', '.join('?' * len(batch)))
+            self.count_query()
+            for code, glyph, w, h in self.connection.execute(
+                    query, batch).fetchall():
+                snippets[code] = glyph, w, h
+        missing = set(codes) - set(snippets)
+        if missing:
+            raise ValueError('No glyph for code {:d}'.format(min(missing)))
+        return snippets
+
+    def svg_snippets(self, symbols):
+        """Get the SVG glyph snippets of many symbols at once.
+
+        Return a dict mapping database codes to (glyph, w, h). Symbols
+        not in the snippet cache are loaded in batches, and the result
+        contains all requested symbols even if they do not all fit the
+        cache.
+
+        >>> iswa = ISWAFont()
+        >>> snippets = iswa.svg_snippets(['S10000', 'S1000f', 'S10000'])
+        >>> sorted((code, w, h) for code, (_, w, h) in snippets.items())
+        [(1, 15, 30), (16, 30, 21)]
+        >>> iswa.queries
+        1
+
+        """
+        snippets = {}
+        missing = set()
+        for symbol in symbols:
+            code = self.code(symbol)
+            if code in snippets or code in missing:
+                continue
+            snippet = self.snippets.get(code)
+            if snippet is None:
+                missing.add(code)
+            else:
+                snippets[code] = snippet
+        loaded = self.load_snippets(sorted(missing))
+        for code, snippet in loaded.items():
+            self.snippets.put(code, snippet)
+        snippets.update(loaded)
+        return snippets
+
+    def iter_snippets(self):
+        """Iterate over (code, glyph, w, h) of all glyphs in the font.
+
+        The font table is read in one sequential scan, ordered by code.
+
+        >>> next(ISWAFont().iter_snippets())[0]
+        1
+
+        """
+        # WARNING: Arbitrary table names, see `__init__`.
         query = (
-            'SELECT glyph, w, h FROM {name:s}, symbol '
-            'WHERE {name:s}.code = ? '
-            'AND symbol.code = ?').format(name=self.name)
+            'SELECT {name:s}.code, glyph, w, h FROM {name:s}, symbol '
+            'WHERE {name:s}.code = symbol.code '
+            'ORDER BY {name:s}.code').format(name=self.name)
+        yield from self.connection.execute(query)
+
+    def load_metrics(self):
+        """Load the width and height of every symbol, in one query.
+
+        Return two arrays of widths and heights, indexed by code, with
+        zeros for codes without a glyph in this font.
+
+        """
+        # WARNING: Arbitrary table names, see `__init__`.
+        query = (
+            'SELECT {name:s}.code, w, h FROM {name:s}, symbol '
+            'WHERE {name:s}.code = symbol.code').format(name=self.name)
+        self.count_query()
+        rows = self.connection.execute(query).fetchall()
+        size = 1 + max((code for code, _, _ in rows), default=0)
+        widths = array('H', bytes(2 * size))
+        heights = array('H', bytes(2 * size))
+        for code, w, h in rows:
+            widths[code] = w
+            heights[code] = h
+        return widths, heights
+
+    def metrics(self):
+        """The widths and heights of all symbols, see `load_metrics`.
+
+        They are loaded on first use and then kept.
 
+        >>> widths, heights = ISWAFont().metrics()
+        >>> widths[ISWAFont.code('S1000f')], heights[ISWAFont.code('S1000f')]
+        (30, 21)
+
+        """
+        if self._metrics is None:
+            self._metrics = self.load_metrics()
+        return self._metrics
+
+    def size(self, symbol):
+        """The width and height of a symbol, without loading its glyph.
+
+        >>> ISWAFont().size('S10000')
+        (15, 30)
+
+        """
+        widths, heights = self.metrics()
         code = self.code(symbol)
-        self.c.execute(query, (code, code))
-        glyph, w, h = self.c.fetchone()
-        return glyph, w, h
+        if code >= len(widths) or not widths[code]:
+            raise ValueError('No glyph for code {:d}'.format(code))
+        return widths[code], heights[code]
+
+    def warm(self, symbols):
+        """Load the glyphs of all `symbols` into the snippet cache.
+
+        >>> iswa = ISWAFont()
+        >>> iswa.warm(['S10000', 'S1000f', 'S10000'])
+        >>> iswa.cache_info()['snippets']['size']
+        2
+
+        """
+        self.svg_snippets(symbols)
+
+    def clear(self):
+        """Empty the glyph caches."""
+        self.snippets.clear()
+        self.templates.clear()
+        self.glyphs.clear()
+
+    def cache_info(self):
+        """Report hit, miss and eviction counters of the glyph caches.
+
+        >>> iswa = ISWAFont()
+        >>> _ = iswa.glyph('S10000')
+        >>> _ = iswa.glyph('S10000')
+        >>> iswa.cache_info()['glyphs']
+        {'size': 1, 'maxsize': 1024, 'hits': 1, 'misses': 1, 'evictions': 0}
+
+        """
+        return {
+            'snippets': self.snippets.stats(),
+            'templates': self.templates.stats(),
+            'glyphs': self.glyphs.stats(),
+            'queries': self.queries}
 
     def complete_svg(self, symbol):
         """Load the image corresponding to `key` from the database.
@@ -132,9 +526,18 @@ class ISWAFont:
         </g>
 
         """
-        svg, w, h = self.svg_snippet(key)
-        svg = svg.replace('#000000', '__line_color__')
-        svg = svg.replace('#ffffff', '__fill_color__')
-        svg = svg.replace('__line_color__', line)
-        svg = svg.replace('__fill_color__', fill)
+        cache_key = (key, line, fill)
+        svg = self.glyphs.get(cache_key)
+        if svg is not None:
+            return svg
+        svg = self.template(key).render(line, fill)
+        self.glyphs.put(cache_key, svg)
         return svg
+
+    def template(self, key):
+        """Return the glyph of `key` compiled into a `GlyphTemplate`."""
+        template = self.templates.get(key)
+        if template is None:
+            template = GlyphTemplate(self.svg_snippet(key)[0])
+            self.templates.put(key, template)
+        return template
@@ -44,6 +44,18 @@ PANEL_TOKEN = re.compile(
     'D' + POS_COORD_BLOCK + '(_' + re_panelword + ')*',
     flags=re.IGNORECASE)
 
+# Used by `parse`: A whole sign (with optional prefix), which is either
+# punctuation with coordinates or a lane with optional maximum
+# coordinates followed by symbols with coordinates, and the symbols
+# with their coordinates split into sign and number groups.
+SIGN = re.compile(
+    '(?:A(?i:' + SYMBOL_BLOCK + ')+)?'
+    '(?:(' + re_punc + ')(n?)([0-9]+)x(n?)([0-9]+)'
+    '|([BLMR])(?:([0-9]+)x([0-9]+))?'
+    '((?:' + SYMBOL_BLOCK + COORD_BLOCK + ')*))')
+SYMBOL_COORDINATES = re.compile(
+    '(' + SYMBOL_BLOCK + ')(n?)([0-9]+)x(n?)([0-9]+)')
+
 
 # Pattern matching on Kartesian SignWriting strings
 
@@ -352,6 +364,18 @@ def swnumber(string):
         return int(string)
 
 
+def swnumber_string(value):
+    """Convert an integer into a KSW number string, the inverse of swnumber.
+
+    >>> swnumber_string(92)
+    '92'
+    >>> swnumber_string(-34)
+    'n34'
+
+    """
+    return 'n{:d}'.format(-value) if value < 0 else '{:d}'.format(value)
+
+
 def coordinates(sw_substring):
     """Convert a KSW coordinate string into a pair of integers.
 
@@ -391,48 +415,99 @@ def parse(layout_string):
 
     >>> parse('')
     [('M', (0, 0))]
+
+    >>> parse('AS18701M18x33S18701n18xn10')
+    [('M', (18, 33)), ('S18701', (-18, -10))]
+
+    >>> parse('M18x33S18701n18xn10S1')
+    Traceback (most recent call last):
+    [...]
+    ValueError: String M18x33S18701n18xn10S1 contained unrecognized elements
     """
-    if not layout_string:
-        return [('M', (0, 0))]
+    return _parse(layout_string, False)
 
-    seq = 'A' + ''.join(prefix_symbols(layout_string))
-    sw_string = layout_string.replace(seq, '')
 
-    match = re.fullmatch(
-        '((' + re_punc + ')(' + COORD_BLOCK + '))|'
-        '([BLMR](' + POS_COORD_BLOCK + ')?)'
-        '((' + SYMBOL_BLOCK + COORD_BLOCK + ')*)',
-        sw_string)
+def parse_ids(layout_string):
+    """Parse a layout string, giving symbols as integer ids.
 
-    if not match:
-        raise ValueError(
-            'String {:} contained unrecognized elements'.format(
-                sw_string))
+    Like `parse`, but every symbol is represented by the integer value
+    of its five hexadecimal digits, so for example S1870a becomes
+    0x1870a. Such an id packs the basic shape (`id >> 8`), the fill
+    (`id >> 4 & 0xf`) and the rotation (`id & 0xf`) of the symbol.
+
+    >>> layout = parse_ids('M18x33S1870an11x15S18701n18xn10')
+    >>> layout[0]
+    ('M', (18, 33))
+    >>> [(hex(symbol), coordinates) for symbol, coordinates in layout[1:]]
+    [('0x1870a', (-11, 15)), ('0x18701', (-18, -10))]
+
+    """
+    return _parse(layout_string, True)
 
-    if match.group(1):
+
+def _parse(layout_string, ids):
+    """Parse a layout string, with symbol ids if `ids` is true."""
+    if not layout_string:
+        return [('M', (0, 0))]
+
+    match = SIGN.fullmatch(layout_string)
+    if not match or match.group(1) and layout_string.startswith('A'):
+        # Like earlier versions, drop the prefix wherever it occurs,
+        # and let it absorb the symbols of punctuation
+        seq = 'A' + ''.join(prefix_symbols(layout_string))
+        layout_string = layout_string.replace(seq, '')
+        match = SIGN.fullmatch(layout_string)
+        if not match or layout_string.startswith('A'):
+            raise ValueError(
+                'String {:} contained unrecognized elements'.format(
+                    layout_string))
+
+    punct, xn, x, yn, y, lane, lane_x, lane_y, _ = match.groups()
+    if punct:
         # This is a punctuation character
-        punct = match.group(2)
-        coord = coordinates(match.group(3))
+        x = -int(x) if xn else int(x)
+        y = -int(y) if yn else int(y)
         return [
-            ('B', (-coord[0], -coord[1])),
-            (punct, coord)]
-    else:
-        # This is some other character
-
-        cluster = []
-        max_x = max_y = float('-inf')
-        for symbol in re.findall(
-                SYMBOL_BLOCK + COORD_BLOCK,
-                match.group(6)):
-            coord = coordinates(symbol[6:])
-            max_x = max(max_x, coord[0])
-            max_y = max(max_y, coord[1])
-            cluster.append(
-                (symbol[:6], coord))
-        cluster.insert(
-            0, (match.group(4)[0],
-                coordinates(match.group(5)) if match.group(5) else (max_x, max_y)))
-        return cluster
+            ('B', (-x, -y)),
+            (int(punct[1:], 16) if ids else punct, (x, y))]
+
+    # This is some other character
+    cluster = [None]
+    max_x = max_y = float('-inf')
+    for symbol, xn, x, yn, y in SYMBOL_COORDINATES.findall(
+            layout_string, match.start(9), match.end(9)):
+        x = -int(x) if xn else int(x)
+        y = -int(y) if yn else int(y)
+        if x > max_x:
+            max_x = x
+        if y > max_y:
+            max_y = y
+        cluster.append((int(symbol[1:], 16) if ids else symbol, (x, y)))
+    cluster[0] = (
+        lane,
+        (int(lane_x), int(lane_y)) if lane_x else (max_x, max_y))
+    return cluster
+
+
+def parse_panel(panel_string):
+    """Parse a panel string to its size and the layouts of its signs.
+
+    Every sign of a panel is placed in the coordinates of the panel,
+    with its lane followed by its maximum coordinates.
+
+    >>> parse_panel('D150x100_M86x45S1870a64x15_S38800n36xn4')
+    Traceback (most recent call last):
+    [...]
+    ValueError: Not a valid KSW panel string: D150x100_M86x45S1870a64x15_S38800n36xn4
+    >>> parse_panel('D150x100_M86x45S1870a64x15S1870a50x20_B75x60S3880050x55')
+    ((150, 100), [[('M', (86, 45)), ('S1870a', (64, 15)), ('S1870a', (50, 20))], [('B', (75, 60)), ('S38800', (50, 55))]])
+
+    """
+    if not PANEL_TOKEN.fullmatch(panel_string):
+        raise ValueError('Not a valid KSW panel string: {:}'.format(
+            panel_string))
+    size, *words = panel_string.split('_')
+    return coordinates(size[1:]), [parse(word) for word in words]
 
 
 def min_coordinates(cluster, min_is_zero=True):
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+"""render_cache: A content-addressed on-disk cache of rendered signs
+
+Rendered glyphograms are stored in files named by a hash of the KSW
+string, the font (name and file identity) and all render options, so
+that CLI runs, flashcard builds and worker processes can share them.
+Files are written atomically, and the cache can be pruned to a maximum
+size, removing the least recently used entries first.
+
+"""
+
+import os
+import json
+import hashlib
+import argparse
+import tempfile
+
+from . import compose
+
+# Change this whenever the output of `glyphogram` changes
+VERSION = 1
+SUFFIX = '.svg'
+
+
+def parse_size(size):
+    """Parse a size like 200M into a number of bytes.
+
+    >>> parse_size('200M')
+    209715200
+    >>> parse_size('1.5k')
+    1536
+    >>> parse_size('1024')
+    1024
+
+    """
+    units = {'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30, 't': 1 << 40}
+    size = size.strip().lower().rstrip('b')
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+class RenderCache:
+    """A directory of rendered glyphograms, addressed by content hash.
+
+    If `max_bytes` is given, the cache prunes itself to that size as it
+    grows beyond it.
+
+    """
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(ksw_string, font, **options):
+        """Hash the normalized KSW string, font and render options.
+
+        >>> class Font:
+        ...     name = 'font_svg1'
+        ...     def identity(self):
+        ...         return 'iswa.sql3:1:2'
+        >>> RenderCache.key(' M18x33S1870an11x15', Font(), pad=1) == (
+        ...     RenderCache.key('M18x33S1870an11x15', Font(), pad=1))
+        True
+        >>> RenderCache.key('M18x33S1870an11x15', Font(), pad=1) == (
+        ...     RenderCache.key('M18x33S1870an11x15', Font(), pad=2))
+        False
+
+        """
+        description = json.dumps(
+            [VERSION, ksw_string.strip(), font.name, font.identity(),
+             sorted(options.items())])
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + SUFFIX)
+
+    def get(self, key):
+        """Return the cached SVG for `key`, or None."""
+        path = self.path(key)
+        try:
+            with open(path, encoding='utf-8') as cached:
+                svg = cached.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            # Mark as recently used, for pruning
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return svg
+
+    def put(self, key, svg):
+        """Store `svg` for `key`, atomically."""
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as output:
+                output.write(svg)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        if self.max_bytes is not None:
+            if self.size is None:
+                self.size = self.stats()['bytes']
+            else:
+                self.size += len(svg)
+            if self.size > self.max_bytes:
+                # Leave some room, so that pruning is not repeated soon
+                self.size = self.prune(self.max_bytes * 9 // 10)['bytes']
+
+    def glyphogram(self, ksw_string, pad=1, bound=None, line='#000000',
+                   fill='#ffffff', colorize=False, font=None):
+        """Like `compose.glyphogram`, but read from or stored in the cache.
+
+        Surrounding whitespace is stripped from `ksw_string`, both for the
+        key and for rendering, so that hits and misses agree.
+
+        """
+        if font is None:
+            font = compose.default_font()
+        ksw_string = ksw_string.strip()
+        key = self.key(ksw_string, font, pad=pad, bound=bound, line=line,
+                       fill=fill, colorize=colorize)
+        svg = self.get(key)
+        if svg is None:
+            svg = compose.glyphogram(
+                ksw_string, pad=pad, bound=bound, line=line, fill=fill,
+                colorize=colorize, font=font)
+            self.put(key, svg)
+        return svg
+
+    def entries(self):
+        """List (mtime, size, path) of all cached files."""
+        entries = []
+        for directory, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(SUFFIX):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def stats(self):
+        """Count the cached files and their total size."""
+        entries = self.entries()
+        return {'files': len(entries),
+                'bytes': sum(size for _, size, _ in entries)}
+
+    def prune(self, max_bytes):
+        """Remove the least recently used files until `max_bytes` remain.
+
+        Return the statistics after pruning.
+
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return {'files': len(entries) - removed, 'bytes': total}
+
+
+def main(argv=None):
+    """Inspect or prune a render cache directory."""
+    parser = argparse.ArgumentParser(
+        prog='swip cache',
+        description=__doc__)
+    parser.add_argument(
+        "action",
+        choices=['stats', 'prune'],
+        help="Show the size of the cache, or prune it")
+    parser.add_argument(
+        "directory",
+        nargs='?',
+        default=os.environ.get('SWIP_CACHE_DIR'),
+        help="The cache directory (default: $SWIP_CACHE_DIR)")
+    parser.add_argument(
+        "--max-size",
+        type=parse_size,
+        default=parse_size('100M'),
+        help="Size to prune the cache to, such as 100M (the default)")
+    args = parser.parse_args(argv)
+    if args.directory is None:
+        parser.error('No cache directory given')
+
+    cache = RenderCache(args.directory)
+    if args.action == 'prune':
+        stats = cache.prune(args.max_size)
+    else:
+        stats = cache.stats()
+    print('{:s}: {:d} files, {:.1f} MB'.format(
+        args.directory, stats['files'], stats['bytes'] / (1 << 20)))
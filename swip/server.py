@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+
+"""server: A small asyncio HTTP server rendering KSW strings to SVG
+
+GET /?ksw=KSW_STRING or GET /KSW_STRING.svg renders the sign, with
+the optional query parameters pad, line, fill (hex colors, with or
+without #), colorize, bound (c or h) and font. Responses are kept in a
+bounded in-memory cache and carry an ETag, so that clients can
+revalidate with If-None-Match. Concurrent requests for the same image
+are rendered only once.
+
+"""
+
+import re
+import sys
+import asyncio
+import sqlite3
+import hashlib
+import functools
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .compose import glyphogram
+from .font_pack import PackedFont
+from .iswa_font import ISWAFont, LRUCache, font_names
+
+COLOR = re.compile('#?([0-9a-fA-F]{3}|[0-9a-fA-F]{6})')
+# Font names end up in SQL queries, see README
+FONT_NAME = re.compile('[A-Za-z0-9_]+')
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request',
+           404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+def render_options(target):
+    """Parse a request target into a normalized tuple of render options.
+
+    Return (ksw_string, pad, bound, line, fill, colorize, font), or
+    raise ValueError for invalid parameters.
+
+    >>> render_options('/?ksw=M18x33S1870an11x15&line=ff0000&colorize=1')
+    ('M18x33S1870an11x15', 1, None, '#ff0000', '#ffffff', True, None)
+    >>> render_options('/M18x33S1870an11x15.svg?bound=c&pad=0')
+    ('M18x33S1870an11x15', 0, 'c', '#000000', '#ffffff', False, None)
+    >>> render_options('/?ksw=M18x33&font=x;DROP')
+    Traceback (most recent call last):
+    [...]
+    ValueError: Invalid font name: x;DROP
+
+    """
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    path = unquote(url.path).lstrip('/')
+    if path.endswith('.svg'):
+        ksw_string = path[:-4]
+    elif not path:
+        ksw_string = query.get('ksw', '')
+    else:
+        raise LookupError(path)
+
+    colors = []
+    for name, default in (('line', '#000000'), ('fill', '#ffffff')):
+        color = query.get(name, default)
+        if not COLOR.fullmatch(color):
+            raise ValueError('Invalid {:s} color: {:}'.format(name, color))
+        colors.append('#' + color.lstrip('#').lower())
+
+    bound = query.get('bound') or None
+    if bound not in (None, 'c', 'h'):
+        raise ValueError('Invalid bound: {:}'.format(bound))
+
+    font = query.get('font')
+    if font is not None and not FONT_NAME.fullmatch(font):
+        raise ValueError('Invalid font name: {:}'.format(font))
+
+    return (ksw_string.strip(),
+            int(query.get('pad', 1)),
+            bound,
+            colors[0],
+            colors[1],
+            query.get('colorize', '').lower() in ('1', 'true', 'yes', 'on'),
+            font)
+
+
+class RenderServer:
+    """Render glyphograms for HTTP requests.
+
+    All rendering happens in one worker thread, which owns the (warm)
+    fonts, so that the event loop keeps accepting requests meanwhile.
+    Only fonts that exist in the database are opened, and at most
+    `max_fonts` of them are kept open.
+
+    >>> server = RenderServer()
+    >>> server.font('font_svg1').name
+    'font_svg1'
+    >>> server.font('font_svg2')
+    Traceback (most recent call last):
+    [...]
+    ValueError: Unknown font: font_svg2
+
+    """
+    def __init__(self, db=None, font_pack=None, cache_size=4096,
+                 max_fonts=8):
+        self.db = db
+        self.font_pack = font_pack
+        self.fonts = LRUCache(max_fonts)
+        self.font_names = None
+        self.responses = LRUCache(cache_size)
+        self.pending = {}
+        self.renders = 0
+        self.executor = ThreadPoolExecutor(1)
+
+    def font(self, name):
+        """Return the font `name`, opening it on first use."""
+        font = self.fonts.get(name)
+        if font is not None:
+            return font
+        if self.font_pack and name is None:
+            font = PackedFont(self.font_pack)
+        else:
+            if self.font_names is None:
+                self.font_names = set(font_names(self.db))
+            if (name or 'font_svg1') not in self.font_names:
+                raise ValueError('Unknown font: {:}'.format(name))
+            font = ISWAFont(db=self.db, name=name or 'font_svg1')
+        self.fonts.put(name, font)
+        return font
+
+    def render(self, options):
+        """Render the glyphogram for normalized `options`, with its ETag."""
+        ksw_string, pad, bound, line, fill, colorize, font = options
+        self.renders += 1
+        body = glyphogram(
+            ksw_string, pad=pad, bound=bound, line=line, fill=fill,
+            colorize=colorize, font=self.font(font)).encode('utf-8')
+        return '"{:s}"'.format(hashlib.sha1(body).hexdigest()), body
+
+    async def response(self, options):
+        """Return the cached response for `options`, or render it.
+
+        Requests for options that are already being rendered wait for
+        that rendering instead of starting another one.
+
+        """
+        cached = self.responses.get(options)
+        if cached is not None:
+            return cached
+        future = self.pending.get(options)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, self.render, options)
+            self.pending[options] = future
+            future.add_done_callback(
+                functools.partial(self._rendered, options))
+        # A client going away must not cancel the rendering for others
+        return await asyncio.shield(future)
+
+    def _rendered(self, options, future):
+        """Move a finished rendering from the pending to the cached ones."""
+        del self.pending[options]
+        if not future.cancelled() and future.exception() is None:
+            self.responses.put(options, future.result())
+
+    async def respond(self, method, target, headers):
+        """Answer one request with (status, extra headers, body)."""
+        if method != 'GET':
+            return 405, {'Allow': 'GET'}, b''
+        try:
+            options = render_options(target)
+            etag, body = await self.response(options)
+        except LookupError:
+            return 404, {}, b''
+        except (ValueError, sqlite3.OperationalError) as error:
+            return 400, {'Content-Type': 'text/plain; charset=utf-8'}, (
+                str(error).encode('utf-8'))
+        except Exception as error:
+            print('Error rendering {:s}: {!r}'.format(target, error),
+                  file=sys.stderr)
+            return 500, {}, b''
+        cache_headers = {'ETag': etag, 'Cache-Control': 'max-age=86400'}
+        if etag in headers.get('if-none-match', ''):
+            return 304, cache_headers, b''
+        return 200, dict(cache_headers, **{
+            'Content-Type': 'image/svg+xml; charset=utf-8'}), body
+
+    async def handle(self, reader, writer):
+        """Serve the (keep-alive) HTTP connection of one client."""
+        try:
+            while True:
+                request = await reader.readline()
+                if not request.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request.decode(
+                        'latin-1').split()
+                except ValueError:
+                    method, target, version = None, '/', 'HTTP/1.0'
+                status, extra, body = await self.respond(
+                    method, target, headers)
+                keep_alive = (
+                    version == 'HTTP/1.1' and
+                    headers.get('connection', '').lower() != 'close')
+                head = ['HTTP/1.1 {:d} {:s}'.format(status, REASONS[status]),
+                        'Content-Length: {:d}'.format(len(body)),
+                        'Connection: {:s}'.format(
+                            'keep-alive' if keep_alive else 'close')]
+                head.extend('{:s}: {:s}'.format(*item)
+                            for item in extra.items())
+                writer.write(
+                    '\r\n'.join(head).encode('latin-1') + b'\r\n\r\n' + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8000, reuse_port=False):
+        """Accept connections until cancelled."""
+        server = await asyncio.start_server(
+            self.handle, host, port, reuse_port=reuse_port)
+        async with server:
+            await server.serve_forever()
+
+
+def _serve(host, port, db, font_pack, cache_size, reuse_port):
+    """Run one server process."""
+    try:
+        asyncio.run(RenderServer(db, font_pack, cache_size).serve(
+            host, port, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    """Serve rendered KSW strings over HTTP."""
+    parser = argparse.ArgumentParser(
+        prog='swip serve',
+        description=__doc__)
+    parser.add_argument(
+        "--host",
+        default='127.0.0.1',
+        help="The address to listen on")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="The port to listen on")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of server processes sharing the port")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=4096,
+        help="Number of responses to keep in memory, per process")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="The ISWA SQLite database to read from")
+    parser.add_argument(
+        "--font-pack",
+        default=None,
+        help="Read the default font from this font pack")
+    args = parser.parse_args(argv)
+
+    print('Serving on http://{:s}:{:d}/'.format(args.host, args.port),
+          file=sys.stderr)
+    options = (args.host, args.port, args.db, args.font_pack,
+               args.cache_size, args.workers > 1)
+    workers = [multiprocessing.Process(target=_serve, args=options)
+               for _ in range(args.workers - 1)]
+    for worker in workers:
+        worker.start()
+    _serve(*options)
+    for worker in workers:
+        worker.join()
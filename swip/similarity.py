@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+"""similarity: Find the signs that look most like a given sign
+
+Every sign is turned into a fixed-length vector counting its basic
+shapes, its complete symbols (with fill and rotation), its symbol types
+and the positions of these types in a 3x3 grid over the sign, with the
+symbol counts hashed into a few buckets. Vectors are normalized, so
+that the dot product of two vectors is their cosine similarity, and
+the vectors of a whole corpus are searched for the nearest neighbours
+of many signs at once by matrix products.
+
+This module requires NumPy.
+
+"""
+
+import sys
+import argparse
+
+import numpy
+
+from . import arrays
+
+SHAPE_BUCKETS = 128
+SYMBOL_BUCKETS = 48
+GRID = 3
+# Layout of the feature vector
+SHAPES = 0
+SYMBOLS = SHAPES + SHAPE_BUCKETS
+TYPES = SYMBOLS + SYMBOL_BUCKETS
+POSITIONS = TYPES + len(arrays.SYMBOL_TYPES)
+DIMENSIONS = POSITIONS + len(arrays.SYMBOL_TYPES) * GRID * GRID
+# The weights of exact symbol matches and of symbol types and their
+# positions, relative to basic shape matches
+SYMBOL_WEIGHT = 0.5
+LAYOUT_WEIGHT = 0.5
+
+
+def _bucket(ids, buckets):
+    """Hash integer ids into `buckets` buckets (multiplicative hashing)."""
+    return (ids.astype(numpy.uint64) * numpy.uint64(2654435761)
+            >> numpy.uint64(7)) % numpy.uint64(buckets)
+
+
+def vectorize(signs):
+    """Compute the normalized feature vectors of `ParsedSigns`.
+
+    Return a float32 array of shape (len(signs), DIMENSIONS). Signs
+    without symbols get a zero vector.
+
+    >>> vectors = vectorize(arrays.parse_many([
+    ...     'M18x33S1870an11x15S18701n18xn10',
+    ...     'M18x33S1870an11x15S18702n18xn10',
+    ...     'M18x33S2ff00n11x15']))
+    >>> vectors.shape == (3, DIMENSIONS)
+    True
+    >>> (vectors @ vectors.T).round(2)
+    array([[1.  , 0.96, 0.  ],
+           [0.96, 1.  , 0.  ],
+           [0.  , 0.  , 1.  ]], dtype=float32)
+
+    """
+    placements = signs.placements
+    rows = placements['sign'].astype(numpy.intp)
+    shapes = placements['symbol'].astype(numpy.uint64)
+    symbols = (shapes << numpy.uint64(8) |
+               placements['fill'].astype(numpy.uint64) << numpy.uint64(4) |
+               placements['rotation'])
+    types = arrays.symbol_types(placements['symbol'])
+
+    # Position of every symbol in a grid over the bounding box of its sign
+    boxes = arrays.bounding_boxes(signs).astype(numpy.float32)
+    low = boxes[rows, :2]
+    extent = numpy.maximum(boxes[rows, 2:] - low, 1)
+    xy = numpy.stack([placements['x'], placements['y']], axis=1)
+    cells = numpy.clip(((xy - low) / extent * GRID).astype(numpy.intp),
+                       0, GRID - 1)
+    cells = cells[:, 1] * GRID + cells[:, 0]
+
+    vectors = numpy.zeros((len(signs), DIMENSIONS), dtype=numpy.float32)
+    numpy.add.at(vectors, (rows, SHAPES + _bucket(
+        shapes, SHAPE_BUCKETS).astype(numpy.intp)), 1)
+    numpy.add.at(vectors, (rows, SYMBOLS + _bucket(
+        symbols, SYMBOL_BUCKETS).astype(numpy.intp)), SYMBOL_WEIGHT)
+    numpy.add.at(vectors, (rows, TYPES + types), LAYOUT_WEIGHT)
+    numpy.add.at(vectors, (rows, POSITIONS + types * GRID * GRID + cells),
+                 LAYOUT_WEIGHT)
+
+    norms = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    numpy.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class SimilarityIndex:
+    """The feature vectors of a corpus of signs, for similarity search.
+
+    >>> index = SimilarityIndex.build([
+    ...     'M18x33S1870an11x15S18701n18xn10',
+    ...     'M18x33S2ff00n11x15',
+    ...     'M18x33S1870an11x15S18702n18xn10S20500n5x5'])
+    >>> [(ksw, round(score, 2))
+    ...  for ksw, score in index.search(['M18x33S1870an11x15'], k=2)[0]]
+    [('M18x33S1870an11x15S18701n18xn10', 0.93), ('M18x33S1870an11x15S18702n18xn10S20500n5x5', 0.81)]
+
+    """
+    def __init__(self, vectors, strings):
+        self.vectors = vectors
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.strings)
+
+    @classmethod
+    def build(cls, ksw_strings):
+        """Vectorize a corpus, skipping strings that cannot be parsed.
+
+        Strings with symbols outside the symbol type ranges are skipped
+        too.
+
+        >>> index = SimilarityIndex.build(
+        ...     ['M18x33S1870an11x15', 'M10x10S3ff00n10xn10', 'M18x33'])
+        >>> index.strings.tolist()
+        ['M18x33S1870an11x15']
+
+        """
+        ksw_strings = [string.strip() for string in ksw_strings]
+        signs = arrays.parse_many(ksw_strings, errors='ignore')
+        known = arrays.known_symbols(signs.placements['symbol'])
+        if not known.all():
+            # Rare, so simply parse again without these strings
+            unknown = set(signs.placements['sign'][~known].tolist())
+            ksw_strings = [string for i, string in enumerate(ksw_strings)
+                           if i not in unknown]
+            signs = arrays.parse_many(ksw_strings, errors='ignore')
+        valid = signs.valid & (signs.counts() > 0)
+        return cls(vectorize(signs)[valid],
+                   numpy.array(ksw_strings)[valid])
+
+    def save(self, path):
+        """Save the index as an uncompressed NumPy .npz file."""
+        with open(path, 'wb') as output:
+            numpy.savez(output, vectors=self.vectors, strings=self.strings)
+
+    @classmethod
+    def load(cls, path):
+        with numpy.load(path) as data:
+            return cls(data['vectors'], data['strings'])
+
+    def top_k(self, vectors, k=10, batch_size=256):
+        """Find the `k` nearest neighbours of every row of `vectors`.
+
+        Return two (len(vectors), k) arrays: the indices of the
+        neighbours, most similar first, and their similarities. The
+        queries are processed `batch_size` at a time, to bound the
+        memory used by the similarity matrix.
+
+        """
+        k = min(k, len(self))
+        indices = numpy.empty((len(vectors), k), dtype=numpy.intp)
+        scores = numpy.empty((len(vectors), k), dtype=numpy.float32)
+        for start in range(0, len(vectors), batch_size):
+            similarity = vectors[start:start + batch_size] @ self.vectors.T
+            best = numpy.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            best_scores = numpy.take_along_axis(similarity, best, axis=1)
+            order = numpy.argsort(-best_scores, axis=1, kind='stable')
+            indices[start:start + batch_size] = numpy.take_along_axis(
+                best, order, axis=1)
+            scores[start:start + batch_size] = numpy.take_along_axis(
+                best_scores, order, axis=1)
+        return indices, scores
+
+    def search(self, ksw_strings, k=10):
+        """Find the `k` most similar signs to every sign in `ksw_strings`.
+
+        Return, for every string, a list of (KSW string, similarity),
+        most similar first.
+
+        """
+        indices, scores = self.top_k(
+            vectorize(arrays.parse_many(ksw_strings)), k)
+        return [[(str(self.strings[i]), float(score))
+                 for i, score in zip(row, row_scores)]
+                for row, row_scores in zip(indices, scores)]
+
+
+def main(argv=None):
+    """Build a similarity index, or search it for similar signs."""
+    parser = argparse.ArgumentParser(
+        prog='swip similar',
+        description=__doc__)
+    parser.add_argument(
+        "index",
+        help="The index file (.npz)")
+    parser.add_argument(
+        "ksw_strings",
+        nargs='*',
+        help="The signs to find similar signs for")
+    parser.add_argument(
+        "--build",
+        nargs='+',
+        type=argparse.FileType('r'),
+        help="Build the index from these KSW (one per line) or SPML files")
+    parser.add_argument(
+        "-k",
+        type=int,
+        default=10,
+        help="Number of similar signs to show for every sign")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        from .symbol_index import corpus_entries
+        index = SimilarityIndex.build(
+            ksw for file in args.build for ksw, _ in corpus_entries(file))
+        index.save(args.index)
+        print('{:s}: {:d} signs'.format(args.index, len(index)),
+              file=sys.stderr)
+    else:
+        index = SimilarityIndex.load(args.index)
+    if args.ksw_strings:
+        try:
+            results = index.search(args.ksw_strings, args.k)
+        except ValueError as error:
+            parser.error(str(error))
+        for ksw_string, similar in zip(args.ksw_strings, results):
+            print(ksw_string)
+            for ksw, score in similar:
+                print('\t{:.3f}\t{:s}'.format(score, ksw))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""sprite: Write ISWA glyphs into a single SVG sprite sheet
+
+Every glyph becomes a `<symbol>` with the id of its ISWA key (such as
+S14c20), its width and height and a matching viewBox, so that web
+pages can reference it as `sprite.svg#S14c20`, for example using
+`compose.glyphogram(..., defs=compose.SpriteRef('sprite.svg'))`.
+
+"""
+
+import sys
+import argparse
+
+from . import parser
+from .font_pack import PackedFont
+from .iswa_font import ISWAFont
+
+
+def corpus_symbols(files):
+    """Collect the set of symbols used in KSW or SPML files.
+
+    Files whose name ends in .spml are read as SignPuddle exports, all
+    others as one KSW string per line.
+
+    """
+    from .swflashcards import iter_spml
+    symbols = set()
+    for file in files:
+        if file.name.endswith('.spml'):
+            strings = (sign.sign_string for sign in iter_spml(file))
+        else:
+            strings = (line.strip() for line in file)
+        for string in strings:
+            try:
+                symbols.update(symbol for symbol, _ in
+                               parser.parse(string)[1:])
+            except ValueError:
+                continue
+    return symbols
+
+
+def write_sprite(font, output, symbols=None):
+    """Write the glyphs of `font` as a sprite sheet to `output`.
+
+    If `symbols` is given, only these symbols are included. The font is
+    read in one sequential scan. Return the number of glyphs written.
+
+    """
+    codes = None if symbols is None else {
+        font.code(symbol) for symbol in symbols}
+    output.write('<svg xmlns="http://www.w3.org/2000/svg">\n')
+    count = 0
+    for code, glyph, w, h in font.iter_snippets():
+        if codes is not None and code not in codes:
+            continue
+        output.write(
+            '<symbol id="{id:s}" width="{w:d}" height="{h:d}" '
+            'viewBox="0 0 {w:d} {h:d}">{glyph:s}</symbol>\n'.format(
+                id=font.key(code), w=w, h=h, glyph=glyph))
+        count += 1
+    output.write('</svg>\n')
+    return count
+
+
+def main(argv=None):
+    """Write an SVG sprite sheet of a font or of the symbols of a corpus."""
+    parser = argparse.ArgumentParser(
+        prog='swip sprite',
+        description=__doc__)
+    parser.add_argument(
+        "output",
+        type=argparse.FileType('w'),
+        help="The sprite sheet file to write")
+    parser.add_argument(
+        "--corpus",
+        nargs='+',
+        type=argparse.FileType('r'),
+        help="Only include symbols used in these KSW (one per line) or "
+        "SPML files")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="The ISWA SQLite database to read from")
+    parser.add_argument(
+        "--font",
+        default="font_svg1",
+        help="The font to use")
+    parser.add_argument(
+        "--font-pack",
+        default=None,
+        help="Read glyphs from this font pack instead of the database")
+    args = parser.parse_args(argv)
+
+    if args.font_pack:
+        font = PackedFont(args.font_pack)
+    else:
+        font = ISWAFont(db=args.db, name=args.font)
+    symbols = corpus_symbols(args.corpus) if args.corpus else None
+    count = write_sprite(font, args.output, symbols)
+    args.output.close()
+    print('Wrote {:d} glyphs to {:s}'.format(count, args.output.name),
+          file=sys.stderr)
@@ -4,28 +4,31 @@
 
 import io
 import bisect
+import hashlib
 
 import os
 import sys
-import json
+import sqlite3
 import argparse
 
 import xml.etree.ElementTree as ET
 
-from urllib.request import urlopen
-from urllib.error import HTTPError
-from urllib.parse import quote_plus
-
 from . import compose
+from .parser import parse
+from .gloss_scores import (
+    ScoreCache, fetch_frequency, parts, score_glosses)
+# Re-exported, it used to be defined here
+from .gloss_scores import DICTAPI_URL  # noqa: F401
 
 ET.register_namespace("", "http://www.w3.org/2000/svg")
-DICTAPI_URL = "https://api.datamuse.com/words?sp={:}&md=f"
 
 class UncleanEntryError (ValueError):
     """A sign puddle markup language entry had no valid glosses."""
 
 
 class Sign:
+    __slots__ = ('sign_string', 'glosses', 'comment', 'source')
+
     def __init__(self, sign, glosses, comment=None, source=None):
         self.sign_string = sign
         self.glosses = tuple(glosses)
@@ -67,57 +70,189 @@ def look_up_frequency(gloss):
     ... look_up_frequency("apple")+look_up_frequency("juice"))
     True
     """
-    dictapi = DICTAPI_URL.format(quote_plus(gloss))
-    gloss_dict = urlopen(dictapi).read().decode('utf-8')
+    this_freq = fetch_frequency(gloss)
 
     freq = None
-    if ' ' in gloss:
-        parts = gloss.split(" ")
-        freq = sum(look_up_frequency(part) or 0.0
-                   for part in parts) / len(parts)
-    elif '-' in gloss:
-        parts = gloss.split("-")
+    split = parts(gloss)
+    if split:
         freq = sum(look_up_frequency(part) or 0.0
-                   for part in parts) / len(parts)
+                   for part in split) / len(split)
 
-    parsed = json.loads(gloss_dict)
-    if not parsed or parsed[0]["word"] != gloss.lower():
+    if this_freq is None:
         return freq
+    return this_freq if not freq or this_freq > freq else freq
+
+
+def iter_spml(spml_file, rejected=None):
+    """Iterate over the signs in a SPML file without loading it whole.
+
+    Entries are parsed as soon as they are complete and then discarded,
+    so memory use does not grow with the size of the file. Entries
+    without valid glosses are skipped, or appended to `rejected` if it
+    is a list.
+
+    >>> spml = io.BytesIO(b'''<spml>
+    ... <entry><term>M18x33S1870an11x15</term><term>apple</term></entry>
+    ... <entry><term>M18x33S1870an11x15</term></entry>
+    ... <entry><term>M18x33S18701n18xn10</term><term>juice</term>
+    ... <text>fruit</text></entry>
+    ... </spml>''')
+    >>> rejected = []
+    >>> [(sign.glosses, sign.comment) for sign in iter_spml(spml, rejected)]
+    [(('apple',), None), (('juice',), 'fruit')]
+    >>> len(rejected)
+    1
+
+    """
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(spml_file, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1 or element.tag != 'entry':
+            continue
+        try:
+            sign = Sign.from_spml_entry(element)
+        except UncleanEntryError:
+            sign = None
+            if rejected is not None:
+                rejected.append(element)
+        else:
+            element.clear()
+        # Detach the finished entry, so it can be garbage collected
+        root.clear()
+        if sign is not None:
+            yield sign
+
+
+class CardManifest:
+    """The scores and rendered cards of the entries of previous runs.
+
+    Entries are identified by a hash of their sign string, glosses and
+    comment (and of `options`, which should describe everything else
+    the rendering depends on), so that a rerun on a new export only
+    needs to score and render the entries that changed. `update`
+    stores the new entries and forgets those not seen in this run.
+
+    >>> manifest = CardManifest(':memory:')
+    >>> sign = Sign('M18x33S1870an11x15', ['apple'])
+    >>> manifest.get(sign) is None
+    True
+    >>> manifest.put(sign, -19.3, '<svg/>')
+    >>> manifest.update()
+    >>> manifest.knows(sign), manifest.get(sign)
+    (True, (-19.3, '<svg/>'))
+    >>> manifest.get(Sign('M18x33S1870an11x15', ['apple'], 'fruit')) is None
+    True
 
-    this_freq = float([
-        f for f in parsed[0]['tags']
-        if f.startswith('f:')][0][2:])
-    freq = this_freq if not freq or this_freq > freq else freq
-    return freq
+    """
+    def __init__(self, path, options=''):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS card '
+            '(hash TEXT PRIMARY KEY, frequency REAL, svg TEXT)')
+        self.options = options
+        # The (small) scores are read at once, the cards when needed
+        self.frequencies = dict(
+            self.db.execute('SELECT hash, frequency FROM card'))
+        self.seen = set()
+        self.new = {}
+
+    def hash(self, sign):
+        return hashlib.sha1(repr(
+            (self.options, sign.sign_string, sign.glosses, sign.comment)
+        ).encode('utf-8')).hexdigest()
+
+    def knows(self, sign):
+        """Whether the entry was stored in a previous run."""
+        return self.hash(sign) in self.frequencies
+
+    def frequency(self, sign):
+        """Return the frequency of a known entry, or raise KeyError.
+
+        The frequency is None for entries without any scored gloss.
+
+        """
+        hash = self.hash(sign)
+        self.seen.add(hash)
+        return self.frequencies[hash]
+
+    def get(self, sign):
+        """Return (frequency, SVG) of a known entry, or None.
+
+        The SVG is None for entries that could not be rendered.
+
+        """
+        hash = self.hash(sign)
+        self.seen.add(hash)
+        if hash in self.new:
+            return self.new[hash]
+        if hash not in self.frequencies:
+            return None
+        return self.frequencies[hash], self.db.execute(
+            'SELECT svg FROM card WHERE hash = ?', (hash,)).fetchone()[0]
+
+    def put(self, sign, frequency, svg):
+        hash = self.hash(sign)
+        self.seen.add(hash)
+        self.new[hash] = frequency, svg
+
+    def update(self, prune=True):
+        """Store the new entries and remove those not seen since opening.
+
+        With `prune` False, entries not seen are kept, for runs that did
+        not get to see all entries (e.g. because they were interrupted).
+
+        """
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO card VALUES (?, ?, ?)',
+                [(hash, frequency, svg)
+                 for hash, (frequency, svg) in self.new.items()])
+            if prune:
+                self.db.executemany(
+                    'DELETE FROM card WHERE hash = ?',
+                    [(hash,) for hash in self.frequencies
+                     if hash not in self.seen])
+        for hash, (frequency, _) in self.new.items():
+            self.frequencies[hash] = frequency
+        self.new = {}
+
+    def close(self):
+        self.db.close()
+
+
+def sign_frequency(sign, scorer=look_up_frequency):
+    """The (negative) score of a sign, or None if no gloss can be scored."""
+    frequency = None
+    for gloss in sign.glosses:
+        try:
+            # Make sure that the rarest words are at the end of the list.
+            frequency = (frequency or 0.0) - scorer(gloss)
+        except TypeError:
+            pass
+    return frequency
 
 
-def parse_spml(spml_file, signs_by_gloss=None, ordered_glosses=None, scores=None, scorer=look_up_frequency, debug=False):
+def parse_spml(spml_file, signs_by_gloss=None, ordered_glosses=None, scores=None, scorer=look_up_frequency, debug=False, manifest=None):
     if signs_by_gloss is None:
         signs_by_gloss = {}
         ordered_glosses = []
     if scores is None:
         scores = [0 for sign in signs_by_gloss]
-    rejected = []
+    rejected = [] if debug else None
     strange = []
 
-    tree = ET.parse(spml_file)
-    root = tree.getroot()
-    for entry in root.findall("entry"):
-        try:
-            sign = Sign.from_spml_entry(entry)
-        except UncleanEntryError:
-            rejected.append(entry)
-            continue
-
-        frequency = 0.0
-        is_strange = True
-        for gloss in sign.glosses:
-            try:
-                # Make sure that the rarest words are at the end of the list.
-                frequency -= scorer(gloss)
-                is_strange = False
-            except TypeError:
-                pass
+    for sign in iter_spml(spml_file, rejected):
+        if manifest is not None and manifest.knows(sign):
+            frequency = manifest.frequency(sign)
+        else:
+            frequency = sign_frequency(sign, scorer)
+        is_strange = frequency is None
 
         if sign.glosses in signs_by_gloss:
             if len(sign.sign_string) > len(signs_by_gloss[sign.glosses].sign_string):
@@ -141,6 +276,161 @@ def parse_spml(spml_file, signs_by_gloss=None, ordered_glosses=None, scores=None
         return signs_by_gloss, strange
 
 
+STYLE = """
+    tr {{ page-break-inside: avoid; max-height: {length:f}cm; overflow: hidden; }}
+    td {{ height: {length:f}cm; width: {length:f}cm; border: 0.3pt solid black; page-break-inside: avoid; }}
+    svg {{ max-width: {length:f}cm; max-height: {length:f}cm; overflow: hidden; }}
+    td div {{ max-width: {length:f}cm; max-height: {length:f}cm; text-align: center; overflow: hidden; }}
+    p {{ max-width: {length:f}cm; max-height: {length:f}cm; overflow: hidden; }}
+    p.comment {{ font-size: 0.5em; }}
+    """
+
+
+def page_name(name, page):
+    """Number a file name for pagination.
+
+    >>> page_name('signs_f.html', 3)
+    'signs_f_003.html'
+
+    """
+    stem, extension = os.path.splitext(name)
+    return '{:s}_{:03d}{:s}'.format(stem, page, extension)
+
+
+class CardWriter:
+    """Write the front and back pages of flash cards row by row.
+
+    Every row is written as soon as it is complete, so that memory use
+    does not grow with the number of cards. If `rows_per_page` is
+    given, the cards are split into numbered pairs of files of that
+    many rows (see `page_name`). The cells of every back row are in
+    reverse order, so that back pages mirror the front pages.
+
+    If `share_symbols` is true, `defs` is the `compose.SymbolDefs` of
+    the current page, whose definitions are written at its end.
+
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> front = os.path.join(directory, 'x_f.html')
+    >>> back = os.path.join(directory, 'x_b.html')
+    >>> with CardWriter(front, back, columns=2, rows_per_page=1) as writer:
+    ...     for gloss in ['a', 'b', 'c']:
+    ...         writer.add(None, Sign('M18x33', [gloss]))
+    >>> sorted(os.listdir(directory))
+    ['x_b_001.html', 'x_b_002.html', 'x_f_001.html', 'x_f_002.html']
+    >>> print(open(os.path.join(directory, 'x_b_002.html')).read(), end='')
+    ... # doctest: +ELLIPSIS
+    <html><style>...</style><body><table>
+    <tr><td /><td><div><p>c</p></div></td></tr>
+    </table></body></html>
+
+    """
+    def __init__(self, front, back, columns=5, rows_per_page=None,
+                 share_symbols=False):
+        self.names = front, back
+        self.columns = columns
+        self.rows_per_page = rows_per_page
+        self.share_symbols = share_symbols
+        self.head = '<html><style>{:s}</style><body><table>\n'.format(
+            STYLE.format(length=18/columns)).encode('ascii')
+        self.files = None
+        self.page = 0
+        self.rows = 0
+        self.cells = 0
+        self.defs = None
+        self.row_f = self.row_b = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open_page(self):
+        self.page += 1
+        self.rows = 0
+        if self.rows_per_page is None:
+            names = self.names
+        else:
+            names = [page_name(name, self.page) for name in self.names]
+        self.files = [open(name, 'wb') for name in names]
+        for file in self.files:
+            file.write(self.head)
+        if self.share_symbols:
+            self.defs = compose.SymbolDefs()
+
+    def _close_page(self):
+        front, back = self.files
+        front.write(b'</table>')
+        if self.defs is not None:
+            # Hidden definitions of all glyphs used on this page
+            front.write(
+                '<svg xmlns="http://www.w3.org/2000/svg" width="0" '
+                'height="0" style="display: none">{:s}</svg>'.format(
+                    self.defs.definitions()).encode(
+                        'ascii', 'xmlcharrefreplace'))
+        back.write(b'</table>')
+        for file in self.files:
+            file.write(b'</body></html>\n')
+            file.close()
+        self.files = None
+
+    def start_card(self):
+        """Make sure a page is open for the next card, and return it."""
+        if self.files is None:
+            self._open_page()
+        return self.page
+
+    def add(self, svg, sign):
+        """Add a card with `svg` (or nothing) on the front, `sign` behind.
+
+        `svg` is an element, or its serialization (as by `ET.tostring`).
+
+        """
+        self.start_card()
+        if self.row_f is None:
+            self.row_f = []
+            self.row_b = ET.Element('tr')
+        cell_b = ET.Element('td')
+        self.row_b.insert(0, cell_b)
+
+        # Front contains svg graphic, which declares its own namespace
+        if svg is None:
+            self.row_f.append(b'<td />')
+        else:
+            if not isinstance(svg, bytes):
+                svg = ET.tostring(svg)
+            self.row_f.append(b'<td>' + svg + b'</td>')
+
+        # Back contains gloss
+        if sign is not None:
+            maxsize = ET.SubElement(cell_b, 'div')
+            ET.SubElement(maxsize, 'p').text = '; '.join(sign.glosses)
+            if sign.comment:
+                ET.SubElement(maxsize, 'p', **{'class': 'comment'}).text = sign.comment
+
+        self.cells += 1
+        if self.cells % self.columns == 0:
+            self._write_row()
+
+    def _write_row(self):
+        front, back = self.files
+        front.write(b'<tr>' + b''.join(self.row_f) + b'</tr>\n')
+        back.write(ET.tostring(self.row_b) + b'\n')
+        self.row_f = self.row_b = None
+        self.rows += 1
+        if self.rows == self.rows_per_page:
+            self._close_page()
+
+    def close(self):
+        """Fill up and write the last row, and finish the last page."""
+        # Fill up last row, so that mirror symmetry is given
+        while self.row_f is not None:
+            self.add(None, None)
+        if self.files is not None:
+            self._close_page()
+
+
 def main():
     """Run the CLI"""
     parser = argparse.ArgumentParser(description=__doc__)
@@ -153,32 +443,58 @@ def main():
         "--gloss-scores",
         type=argparse.FileType('r'),
         help="JSON file with cached gloss scores")
+    parser.add_argument(
+        "--score-cache",
+        default=None,
+        help="SQLite file caching word frequencies across runs")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of concurrent word frequency lookups")
     parser.add_argument(
         "--front",
-        type=argparse.FileType('wb'),
         help="HTML file to write signs to")
     parser.add_argument(
         "--back",
-        type=argparse.FileType('wb'),
         help="HTML file to write glosses to")
     parser.add_argument(
         "--columns",
         type=int,
         default=5,
         help="Print this many columns of cards per row")
+    parser.add_argument(
+        "--rows-per-page",
+        type=int,
+        default=None,
+        help="Split the cards into numbered files of this many rows")
+    parser.add_argument(
+        "--share-symbols",
+        action="store_true",
+        default=False,
+        help="Define every distinct glyph once and reference it from "
+        "the signs, for much smaller front pages")
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get('SWIP_CACHE_DIR'),
+        help="Directory caching rendered signs (default: $SWIP_CACHE_DIR)")
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="SQLite file keeping scores and rendered cards of all "
+        "entries, so that reruns only process changed entries")
     args = parser.parse_args()
+    import json
 
     if args.front is None:
         name = args.spml_file[0].name
-        args.front = open(
-            (name[:-5] if name.endswith('.spml') else name) +
-            '_f.html', 'wb')
+        args.front = (
+            (name[:-5] if name.endswith('.spml') else name) + '_f.html')
     if args.back is None:
-        name = args.front.name
-        args.back = open(
+        name = args.front
+        args.back = (
             (name[:-7] if name.endswith('_f.html') else
-             name[:-5] if name.endswith('.html') else name) +
-            '_b.html', 'wb')
+             name[:-5] if name.endswith('.html') else name) + '_b.html')
 
     # Read a cache file of gloss scores
     if args.gloss_scores:
@@ -186,26 +502,54 @@ def main():
     else:
         score_cache = {}
 
+    if args.manifest:
+        font = compose.default_font()
+        manifest = CardManifest(args.manifest, json.dumps([
+            2, args.share_symbols, font.name, font.identity()]))
+    else:
+        manifest = None
+
+    # The files are read twice, so buffer standard input and pipes
+    args.spml_file = [
+        file if file.seekable() else io.StringIO(file.read())
+        for file in args.spml_file]
+
+    # Look up all new glosses up front, concurrently
+    try:
+        new_glosses = set()
+        for file in args.spml_file:
+            for sign in iter_spml(file):
+                if manifest is not None and manifest.knows(sign):
+                    continue
+                new_glosses.update(
+                    gloss for gloss in sign.glosses
+                    if gloss not in score_cache)
+            file.seek(0)
+        print('Scoring {:d} glosses'.format(len(new_glosses)),
+              file=sys.stderr)
+        frequency_cache = ScoreCache(args.score_cache or ':memory:')
+        score_cache.update(score_glosses(
+            new_glosses, frequency_cache, args.workers))
+        frequency_cache.close()
+    except KeyboardInterrupt:
+        pass
+
     def scorer(gloss):
-        print(gloss, file=sys.stderr)
-        try:
-            return score_cache[gloss]
-        except KeyError:
-            score = look_up_frequency(gloss)
-            score_cache[gloss] = score
-            return score
+        return score_cache.get(gloss)
 
     # Read all signs from a spml file
+    interrupted = False
     try:
         signs = {}
         glosses = []
         scores = []
         strange = []
         for file in args.spml_file:
-            _, strange_here = parse_spml(file, signs, glosses, scores, scorer)
+            _, strange_here = parse_spml(
+                file, signs, glosses, scores, scorer, manifest=manifest)
             strange += strange_here
     except KeyboardInterrupt:
-        pass
+        interrupted = True
 
     # Try to write-back a file of gloss scores
     try:
@@ -215,77 +559,60 @@ def main():
     except (AttributeError, OSError):
         pass
 
-    # HTML Template
-    COLUMNS = args.columns
-
-    STYLE = """
-    tr {{ page-break-inside: avoid; max-height: {length:f}cm; overflow: hidden; }}
-    td {{ height: {length:f}cm; width: {length:f}cm; border: 0.3pt solid black; page-break-inside: avoid; }}
-    svg {{ max-width: {length:f}cm; max-height: {length:f}cm; overflow: hidden; }}
-    td div {{ max-width: {length:f}cm; max-height: {length:f}cm; text-align: center; overflow: hidden; }}
-    p {{ max-width: {length:f}cm; max-height: {length:f}cm; overflow: hidden; }}
-    p.comment {{ font-size: 0.5em; }}
-    """.format(length=18/COLUMNS)
-
-    html_f = ET.Element('html')
-    document_f = ET.ElementTree(html_f)
-    style_f = ET.SubElement(html_f, 'style')
-    style_f.text = STYLE
-    body_f = ET.SubElement(html_f, 'body')
-    table_f = ET.SubElement(body_f, 'table')
-
-    html_b = ET.Element('html')
-    document_b = ET.ElementTree(html_b)
-    style_b = ET.SubElement(html_b, 'style')
-    style_b.text = STYLE
-    body_b = ET.SubElement(html_b, 'body')
-    table_b = ET.SubElement(body_b, 'table')
-
     # Generate HTML
+    if args.cache_dir and not args.share_symbols:
+        from .render_cache import RenderCache
+        cache = RenderCache(args.cache_dir)
+
+        def render(ksw_string, defs):
+            return ET.parse(io.StringIO(
+                cache.glyphogram(ksw_string, bound=None))).getroot()
+    else:
+        def render(ksw_string, defs):
+            return compose.glyphogram_element(
+                ksw_string, bound=None, defs=defs)
     strange = sorted(strange, key=lambda x: len(x.glosses[0]))
+    writer = CardWriter(args.front, args.back, args.columns,
+                        args.rows_per_page, args.share_symbols)
     try:
         for i, sign in enumerate([signs[g] for g in glosses] + strange):
-            if i % COLUMNS == 0:
-                # Start a new row
-                row_f = ET.SubElement(table_f, 'tr')
-                row_b = ET.SubElement(table_b, 'tr')
+            if i % args.columns == 0:
                 print(i, file=sys.stderr)
-
-            cell_f = ET.SubElement(row_f, 'td')
-            cell_b = ET.Element('td')
-            row_b.insert(0, cell_b)
-
-            # Front contains svg graphic
-            try:
-                svg = ET.parse(io.StringIO(compose.glyphogram(
-                    sign.sign_string,
-                    bound=None))).getroot()
-                svg.attrib['viewbox'] = "0 0 {:} {:}".format(
-                    svg.attrib['width'], svg.attrib['height'])
-                cell_f.insert(0, svg)
-            except ValueError:
-                # Leave cell blank
-                pass
-
-            # Back contains gloss
-            maxsize = ET.SubElement(cell_b, 'div')
-            ET.SubElement(maxsize, 'p').text = '; '.join(sign.glosses)
-            if sign.comment:
-                ET.SubElement(maxsize, 'p', **{'class': 'comment'}).text = sign.comment
+            writer.start_card()
+
+            front = None
+            known = manifest.get(sign) if manifest is not None else None
+            if known is not None and known[1] is not None:
+                # The stored front is written as it is
+                front = known[1].encode('ascii')
+                if writer.defs is not None:
+                    # Record the glyphs the stored card references
+                    for symbol, _ in parse(sign.sign_string)[1:]:
+                        writer.defs.use(symbol[1:6], '#000000', '#ffffff')
+            else:
+                frequency = sign_frequency(sign, scorer)
+                try:
+                    svg = render(sign.sign_string, writer.defs)
+                except ValueError:
+                    # Leave cell blank
+                    pass
+                else:
+                    svg.attrib['viewbox'] = "0 0 {:} {:}".format(
+                        svg.attrib['width'], svg.attrib['height'])
+                    front = ET.tostring(svg)
+                if manifest is not None:
+                    manifest.put(sign, frequency, None if front is None else
+                                 front.decode('ascii'))
+            writer.add(front, sign)
     except KeyboardInterrupt:
-        pass
-
-    i += 1
-    # Fill up last row, so that mirror symmetry is given
-    while i % COLUMNS != 0:
-        cell_f = ET.SubElement(row_f, 'td')
-        cell_b = ET.Element('td')
-        row_b.insert(0, cell_b)
-        i += 1
-
-    # Write output to files
-    document_f.write(args.front)
-    document_b.write(args.back)
+        interrupted = True
+    finally:
+        writer.close()
+
+    if manifest is not None:
+        # An interrupted run has not seen all entries, so keep the others
+        manifest.update(prune=not interrupted)
+        manifest.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+"""symbol_index: A persistent index of the symbols used in a sign corpus
+
+Every symbol placed in a sign is stored in an SQLite table, keyed by
+the integer id of the symbol (basic shape, fill and rotation), so that
+the signs using a symbol, a fill of a basic shape or any variant of it
+form one contiguous posting list in the index. Searches combine such
+lists with AND and OR, optionally restricted to symbols placed inside a
+box of coordinates, without parsing any sign again. Signs can be added
+to an existing index at any time.
+
+"""
+
+import re
+import sys
+import sqlite3
+import argparse
+import itertools
+
+from . import parser
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sign (
+    id INTEGER PRIMARY KEY,
+    ksw TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS gloss (
+    sign INTEGER NOT NULL REFERENCES sign(id),
+    gloss TEXT NOT NULL,
+    PRIMARY KEY (sign, gloss));
+CREATE TABLE IF NOT EXISTS placement (
+    symbol INTEGER NOT NULL,
+    sign INTEGER NOT NULL REFERENCES sign(id),
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS posting ON placement (symbol, sign, x, y);
+"""
+
+# A search term: a symbol or symbol prefix, optionally followed by a
+# box x_min,y_min,x_max,y_max its placement must lie in
+TERM = re.compile(
+    r'(S[123][0-9a-f]{2}(?:[0-5](?:[0-9a-f])?)?)'
+    r'(?:@(-?\d+),(-?\d+),(-?\d+),(-?\d+))?',
+    flags=re.IGNORECASE)
+
+
+def parse_term(term):
+    """Parse a search term into (symbol id range, box).
+
+    The symbol may be a basic shape (S14c), a basic shape with fill
+    (S14c2) or a complete symbol (S14c20), optionally followed by
+    @x_min,y_min,x_max,y_max.
+
+    >>> parse_term('S14c')
+    ((84992, 85247), None)
+    >>> parse_term('S14c2')
+    ((85024, 85039), None)
+    >>> parse_term('S14c20@-30,-60,30,-20')
+    ((85024, 85024), (-30, -60, 30, -20))
+    >>> parse_term('S14c2g')
+    Traceback (most recent call last):
+    [...]
+    ValueError: Invalid search term: S14c2g
+
+    """
+    match = TERM.fullmatch(term.strip())
+    if not match:
+        raise ValueError('Invalid search term: {:}'.format(term))
+    symbol = match.group(1)
+    free_bits = 4 * (6 - len(symbol))
+    lower = int(symbol[1:], 16) << free_bits
+    upper = lower | ((1 << free_bits) - 1)
+    box = None
+    if match.group(2) is not None:
+        box = tuple(int(match.group(i)) for i in range(2, 6))
+    return (lower, upper), box
+
+
+class SymbolIndex:
+    """An inverted index from symbols to the signs using them.
+
+    >>> index = SymbolIndex(':memory:')
+    >>> index.add(['M18x33S1870an11x15S18701n18xn10',
+    ...            'M18x33S14c20n18xn18S2ff00n10xn30',
+    ...            'M18x33S14c28n18x5'], glosses=['a', 'b', 'c'])
+    3
+    >>> index.add(['M18x33S14c28n18x5', 'M10x10S14c31n10xn10'])
+    1
+
+    Signs are stored once, with all their glosses:
+
+    >>> index.add(['M18x33S14c28n18x5'], glosses=['d'])
+    0
+    >>> index.search(['S14c'])
+    [(2, 'M18x33S14c20n18xn18S2ff00n10xn30', 'b'), (3, 'M18x33S14c28n18x5', 'c; d'), (4, 'M10x10S14c31n10xn10', None)]
+    >>> [id for id, _, _ in index.search(['S14c2', 'S2ff'])]
+    [2]
+    >>> [id for id, _, _ in index.search(any=['S1870', 'S14c3'])]
+    [1, 4]
+    >>> [id for id, _, _ in index.search(['S14c@-30,-30,0,0'])]
+    [2, 4]
+
+    """
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT count(*) FROM sign').fetchone()[0]
+
+    def add(self, ksw_strings, glosses=None, errors='raise'):
+        """Add the signs in `ksw_strings` that are not yet in the index.
+
+        `glosses`, if given, holds a gloss (or None) for every string,
+        which is also added to signs already in the index. If `errors`
+        is 'raise', a string that cannot be parsed raises a ValueError,
+        if it is 'ignore', it is skipped. Return the number of signs
+        added.
+
+        """
+        if errors not in ('raise', 'ignore'):
+            raise ValueError('Unknown error handling: {:}'.format(errors))
+        if glosses is None:
+            glosses = itertools.repeat(None)
+        added = 0
+        with self.db:
+            cursor = self.db.cursor()
+            for ksw_string, gloss in zip(ksw_strings, glosses):
+                ksw_string = ksw_string.strip()
+                try:
+                    symbols = parser.parse_ids(ksw_string)[1:]
+                except ValueError:
+                    if errors == 'raise':
+                        raise
+                    continue
+                cursor.execute(
+                    'INSERT OR IGNORE INTO sign (ksw) VALUES (?)',
+                    (ksw_string,))
+                if cursor.rowcount:
+                    sign = cursor.lastrowid
+                    cursor.executemany(
+                        'INSERT INTO placement VALUES (?, ?, ?, ?)',
+                        [(symbol, sign, x, y) for symbol, (x, y) in symbols])
+                    added += 1
+                else:
+                    # A homonym of a sign in the index
+                    sign = cursor.execute(
+                        'SELECT id FROM sign WHERE ksw = ?',
+                        (ksw_string,)).fetchone()[0]
+                if gloss is not None:
+                    cursor.execute(
+                        'INSERT OR IGNORE INTO gloss VALUES (?, ?)',
+                        (sign, gloss))
+        return added
+
+    @staticmethod
+    def _postings(term):
+        """SQL for the ids of the signs matching one term, and its values."""
+        (lower, upper), box = parse_term(term)
+        sql = 'SELECT sign FROM placement WHERE symbol BETWEEN ? AND ?'
+        values = [lower, upper]
+        if box is not None:
+            sql += ' AND x BETWEEN ? AND ? AND y BETWEEN ? AND ?'
+            values += [box[0], box[2], box[1], box[3]]
+        return sql, values
+
+    def search(self, all=(), any=(), limit=None):
+        """Find the signs matching all terms in `all` and any in `any`.
+
+        See `parse_term` for the form of the terms. Return a list of
+        (sign id, KSW string, glosses), ordered by sign id, where the
+        glosses are separated by '; ', or None if there are none.
+
+        """
+        if not all and not any:
+            raise ValueError('No search terms given')
+        parts = []
+        values = []
+        for term in all:
+            sql, term_values = self._postings(term)
+            parts.append(sql)
+            values += term_values
+        if any:
+            union = [self._postings(term) for term in any]
+            parts.append('SELECT sign FROM ({:s})'.format(
+                ' UNION '.join(sql for sql, _ in union)))
+            for _, term_values in union:
+                values += term_values
+        sql = ("SELECT id, ksw, (SELECT group_concat(gloss, '; ') FROM "
+               '(SELECT gloss FROM gloss WHERE gloss.sign = sign.id '
+               'ORDER BY rowid)) '
+               'FROM sign WHERE id IN ({:s}) '
+               'ORDER BY id'.format(' INTERSECT '.join(parts)))
+        if limit is not None:
+            sql += ' LIMIT ?'
+            values.append(limit)
+        return self.db.execute(sql, values).fetchall()
+
+
+def corpus_entries(file):
+    """Iterate over (KSW string, gloss) in a KSW or SPML file.
+
+    Files whose name ends in .spml are read as SignPuddle exports, with
+    their first gloss, all others as one KSW string per line.
+
+    """
+    if file.name.endswith('.spml'):
+        from .swflashcards import iter_spml
+        for sign in iter_spml(file):
+            yield sign.sign_string, sign.glosses[0]
+    else:
+        for line in file:
+            if line.strip():
+                yield line.strip(), None
+
+
+def main(argv=None):
+    """Build or search a symbol index of a sign corpus."""
+    parser = argparse.ArgumentParser(
+        prog='swip index',
+        description=__doc__)
+    parser.add_argument(
+        "index",
+        help="The index database file")
+    parser.add_argument(
+        "--add",
+        nargs='+',
+        type=argparse.FileType('r'),
+        default=[],
+        help="Add the signs in these KSW (one per line) or SPML files")
+    parser.add_argument(
+        "--all",
+        nargs='+',
+        default=[],
+        help="Find signs containing all these symbols, such as S14c, "
+        "S14c2, S14c20 or S14c@-30,-60,30,-20 (within that box)")
+    parser.add_argument(
+        "--any",
+        nargs='+',
+        default=[],
+        help="Find signs containing any of these symbols")
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Show at most this many signs")
+    args = parser.parse_args(argv)
+
+    index = SymbolIndex(args.index)
+    for file in args.add:
+        entries = list(corpus_entries(file))
+        added = index.add([ksw for ksw, _ in entries],
+                          [gloss for _, gloss in entries],
+                          errors='ignore')
+        print('{:s}: added {:d} of {:d} signs'.format(
+            file.name, added, len(entries)), file=sys.stderr)
+    if args.all or args.any:
+        try:
+            results = index.search(args.all, args.any, args.limit)
+        except ValueError as error:
+            parser.error(str(error))
+        for id, ksw, gloss in results:
+            print('{:d}\t{:s}\t{:s}'.format(id, ksw, gloss or ''))
+    index.close()
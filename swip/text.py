@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+"""text: Lay out and render whole SignWriting texts
+
+A text is a sequence of KSW signs and punctuation separated by
+whitespace. It is written in columns, read top to bottom and left to
+right: every sign is stacked below the previous one, horizontally
+centered in its lane (B and M in the middle of the column, L to the
+left and R to the right of it), and a new column starts when the next
+sign does not fit. Each column is a panel string (`D...`, see
+`parser.PANEL_TOKEN`), which may also be given directly in the text.
+
+Only the widths and heights of symbols are needed to lay out a text,
+so `panels` never loads a glyph. `write_svg` streams the SVG of a text
+to a file column by column, defining every glyph once for the whole
+document, so that memory use does not grow with the length of the text.
+
+"""
+
+import re
+import sys
+import argparse
+
+from . import parser
+from .parser import swnumber_string
+from .compose import SymbolDefs, _measure, _placements, default_font
+from .font_pack import PackedFont
+from .iswa_font import ISWAFont
+
+_TOKEN = re.compile(r'\S+')
+_PUNCTUATION = re.compile(parser.re_punc, flags=re.IGNORECASE)
+
+
+def panels(text, font=None, height=500, width=150, offset=50, pad=20,
+           margin=5, errors='raise'):
+    """Lay out a text in columns, yielding a panel string per column.
+
+    Columns are `width` wide and at most `height` high (unless a single
+    sign is larger), with `pad` of space above the first sign and below
+    the last and `margin` between signs. Signs in the L and R lanes are
+    centered `offset` left or right of the middle of the column. If
+    `errors` is 'ignore', tokens that are not signs are skipped,
+    otherwise they raise a ValueError.
+
+    >>> list(panels('MS10000n10xn15 RS1000f0x0 S38800 MS10000n10xn15',
+    ...             height=100, width=60, offset=10, pad=5))
+    ['D60x87_M38x35S1000023x5_R55x61S1000f25x40_B44x82S3880017x66', 'D60x40_M38x35S1000023x5']
+
+    """
+    if errors not in ('raise', 'ignore'):
+        raise ValueError('Unknown error handling: {:}'.format(errors))
+    if font is None:
+        font = default_font()
+    metrics = font.metrics()
+    centers = {'B': width // 2, 'M': width // 2,
+               'L': width // 2 - offset, 'R': width // 2 + offset}
+    words = []
+    right = width
+    y = pad
+    for match in _TOKEN.finditer(text):
+        token = match.group(0)
+        if parser.PANEL_TOKEN.fullmatch(token):
+            if words:
+                yield 'D{:d}x{:d}_{:s}'.format(right, y - margin + pad,
+                                               '_'.join(words))
+                words = []
+                right = width
+                y = pad
+            yield token
+            continue
+        if _PUNCTUATION.fullmatch(token):
+            # Raw punctuation, without coordinates
+            token += '0x0'
+        try:
+            layout = parser.parse(token)
+            x_min, y_min, x_max, y_max = _measure(layout, metrics)
+        except ValueError:
+            if errors == 'raise':
+                raise
+            continue
+
+        if words and y + y_max - y_min > height - pad:
+            yield 'D{:d}x{:d}_{:s}'.format(right, y - margin + pad,
+                                           '_'.join(words))
+            words = []
+            right = width
+            y = pad
+        lane = layout[0][0]
+        dx = max(centers[lane] - (x_max - x_min) // 2, 0) - x_min
+        dy = y - y_min
+        words.append('{:s}{:d}x{:d}{:s}'.format(
+            lane, x_max + dx, y_max + dy, ''.join(
+                '{:s}{:s}x{:s}'.format(symbol, swnumber_string(x + dx),
+                                       swnumber_string(y + dy))
+                for symbol, (x, y) in layout[1:])))
+        right = max(right, x_max + dx)
+        y += y_max - y_min + margin
+    if words:
+        yield 'D{:d}x{:d}_{:s}'.format(right, y - margin + pad,
+                                       '_'.join(words))
+
+
+def write_svg(text, output, font=None, line='#000000', fill='#ffffff',
+              colorize=False, **layout):
+    """Write the SVG of a text to the file-like object `output`.
+
+    The text is laid out with `panels`, taking the same `layout`
+    arguments, once to find the size of the document and once more
+    while writing it. Each column is written as soon as it is laid out,
+    followed by the definitions of the glyphs used for the first time
+    in it, which are loaded together.
+
+    >>> import io
+    >>> output = io.StringIO()
+    >>> write_svg('MS10000n10xn15 S38800', output, height=100, width=60)
+    >>> print(output.getvalue(), end='') # doctest: +ELLIPSIS
+    <?xml version="1.0" standalone="no"?>
+    <svg version="1.0" xmlns="http://www.w3.org/2000/svg" width="60" height="91">
+    <metadata>Generated with SWIP using Valerie Sutton's ISWA 2010 symbols (font_svg1)</metadata>
+    <g transform="translate(0,0)"><g transform="translate(23,20)"><use href="#S10000"/></g><g transform="translate(17,55)"><use href="#S38800"/></g></g>
+    <defs><g id="S10000"><g>
+    ...
+    </g></g><g id="S38800"><g>...</g></g></defs>
+    </svg>
+
+    """
+    if font is None:
+        font = default_font()
+    width = height = 0
+    for panel in panels(text, font, **layout):
+        panel_width, panel_height = parser.coordinates(
+            panel[1:].split('_', 1)[0])
+        width += panel_width
+        height = max(height, panel_height)
+
+    output.write(
+        '<?xml version="1.0" standalone="no"?>\n'
+        '<svg version="1.0" xmlns="http://www.w3.org/2000/svg" '
+        'width="{:d}" height="{:d}">\n'
+        "<metadata>Generated with SWIP using Valerie Sutton's ISWA 2010 "
+        'symbols ({:})</metadata>\n'.format(width, height, font.name))
+    defined = set()
+    left = 0
+    for panel in panels(text, font, **layout):
+        (panel_width, _), layouts = parser.parse_panel(panel)
+        new = []
+        images = []
+        for layout in layouts:
+            for key, color, x, y in _placements(layout, 0, 0, line,
+                                                colorize):
+                if (key, color) not in defined:
+                    defined.add((key, color))
+                    new.append((key, color))
+                images.append(
+                    '<g transform="translate({:d},{:d})">'
+                    '<use href="#{:s}"/></g>'.format(
+                        x, y, SymbolDefs.id(key, color, fill)))
+        output.write('<g transform="translate({:d},0)">{:s}</g>\n'.format(
+            left, ''.join(images)))
+        if new:
+            font.warm(key for key, _ in new)
+            output.write('<defs>{:s}</defs>\n'.format(''.join(
+                '<g id="{:s}">{:s}</g>'.format(
+                    SymbolDefs.id(key, color, fill),
+                    font.glyph(key, color, fill))
+                for key, color in new)))
+        left += panel_width
+    output.write('</svg>\n')
+
+
+def main(argv=None):
+    """Render a SignWriting text as an SVG graphic."""
+    parser = argparse.ArgumentParser(
+        prog='swip text',
+        description=__doc__)
+    parser.add_argument(
+        "input",
+        type=argparse.FileType('r'),
+        help="The file containing the text (- for standard input)")
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType('w'),
+        default=sys.stdout,
+        help="The file to write output to")
+    parser.add_argument(
+        "--panels",
+        action="store_true",
+        default=False,
+        help="Write the panel strings of the columns, one per line, "
+        "instead of SVG")
+    parser.add_argument(
+        "--height",
+        type=int,
+        default=500,
+        help="The maximum height of a column")
+    parser.add_argument(
+        "--width",
+        type=int,
+        default=150,
+        help="The width of a column")
+    parser.add_argument(
+        "--offset",
+        type=int,
+        default=50,
+        help="The distance of the L and R lanes from the middle")
+    parser.add_argument(
+        "--pad",
+        type=int,
+        default=20,
+        help="The space above and below the signs of a column")
+    parser.add_argument(
+        "--margin",
+        type=int,
+        default=5,
+        help="The space between signs")
+    parser.add_argument(
+        "--colorize",
+        action="store_true",
+        default=False,
+        help="Color symbols by their symbol group")
+    parser.add_argument(
+        "--font",
+        default="font_svg1",
+        help="The font to use")
+    parser.add_argument(
+        "--font-pack",
+        default=None,
+        help="Read glyphs from this font pack instead of the database")
+    args = parser.parse_args(argv)
+
+    if args.font_pack:
+        font = PackedFont(args.font_pack)
+    else:
+        font = ISWAFont(name=args.font)
+    text = args.input.read()
+    layout = dict(height=args.height, width=args.width,
+                  offset=args.offset, pad=args.pad, margin=args.margin)
+    try:
+        if args.panels:
+            for panel in panels(text, font, **layout):
+                print(panel, file=args.output)
+        else:
+            write_svg(text, args.output, font, colorize=args.colorize,
+                      **layout)
+    except ValueError as error:
+        parser.error(str(error))
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+"""validate: Classify many lines of Kartesian SignWriting at once
+
+Every line is classified as raw, expanded, layouted or panel KSW (in
+this order of preference, as in `parser.is_raw` etc.), or as invalid,
+in which case the offset of the first character that does not fit is
+reported as well. Files are validated in chunks, in parallel, without
+reading them into memory as a whole.
+
+"""
+
+import re
+import sys
+import mmap
+import argparse
+import multiprocessing
+from array import array
+
+from . import parser
+
+INVALID, RAW, EXPANDED, LAYOUTED, PANEL = range(5)
+NAMES = ('invalid', 'raw', 'expanded', 'layouted', 'panel')
+
+# The token patterns of each class, in order of preference
+TOKENS = (
+    (RAW, parser.RAW_TOKEN),
+    (EXPANDED, parser.EXPANDED_TOKEN),
+    (LAYOUTED, parser.LAYOUT_TOKEN),
+    (PANEL, parser.PANEL_TOKEN))
+
+
+def _compile(encode):
+    """Compile whole-line and token patterns, as str or bytes patterns."""
+    patterns = []
+    for kind, token in TOKENS:
+        source = encode(token.pattern)
+        patterns.append((
+            kind,
+            re.compile(
+                encode(r'\s*(?:(?:') + source + encode(r')(?:\s+|\Z))*'),
+                flags=re.IGNORECASE),
+            re.compile(source, flags=re.IGNORECASE)))
+    return patterns
+
+
+STR_PATTERNS = _compile(str)
+BYTES_PATTERNS = _compile(lambda pattern: pattern.encode('ascii'))
+STR_WORD = re.compile(r'\S+')
+BYTES_WORD = re.compile(rb'\S+')
+
+
+def classify(line):
+    """Classify one line (str or bytes), returning (class, offset).
+
+    The offset is that of the first offending character for invalid
+    lines, and None otherwise. An empty line is raw, like `is_raw('')`.
+
+    >>> classify('MS1870an11x15 S38800')
+    (1, None)
+    >>> classify(b'B10x10S10000n10xn10')
+    (3, None)
+    >>> classify('D20x20_M18x33S1870an11x15')
+    (4, None)
+    >>> classify('M18x33S1870an11x15 M18x33S1870an11y15')
+    (0, 25)
+
+    """
+    if isinstance(line, bytes):
+        patterns, word = BYTES_PATTERNS, BYTES_WORD
+    else:
+        patterns, word = STR_PATTERNS, STR_WORD
+    for kind, whole, _ in patterns:
+        if whole.fullmatch(line):
+            return kind, None
+    return INVALID, _offending_offset(line, patterns, word)
+
+
+def _offending_offset(line, patterns, word):
+    """Find how far the most successful class matches `line`."""
+    best = 0
+    for _, _, token in patterns:
+        for match in word.finditer(line):
+            start, end = match.span()
+            if token.fullmatch(line, start, end):
+                continue
+            prefix = token.match(line, start, end)
+            best = max(best, prefix.end() if prefix else start)
+            break
+    return best
+
+
+def validate_lines(lines):
+    """Classify many lines.
+
+    Return a compact array of classes, one byte per line, and a list of
+    (line index, offset) of the invalid lines.
+
+    >>> codes, errors = validate_lines(['BS10000n10xn10', 'B10x10', 'X'])
+    >>> [NAMES[code] for code in codes]
+    ['raw', 'layouted', 'invalid']
+    >>> errors
+    [(2, 0)]
+
+    """
+    codes = array('B')
+    errors = []
+    for i, line in enumerate(lines):
+        kind, offset = classify(line.rstrip('\r\n')
+                                if isinstance(line, str)
+                                else line.rstrip(b'\r\n'))
+        codes.append(kind)
+        if kind == INVALID:
+            errors.append((i, offset))
+    return codes, errors
+
+
+def _validate_chunk(task):
+    """Classify the lines of one byte range of a file."""
+    path, start, end = task
+    with open(path, 'rb') as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        lines = data[start:end].split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    codes, errors = validate_lines(lines)
+    return codes.tobytes(), [
+        (i, offset, lines[i].decode('utf-8', 'replace'))
+        for i, offset in errors]
+
+
+def chunks(path, chunk_size=1 << 24):
+    """Split a file into byte ranges of about `chunk_size` at line ends."""
+    with open(path, 'rb') as file:
+        file.seek(0, 2)
+        size = file.tell()
+        if not size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            while start < size:
+                end = data.find(b'\n', min(start + chunk_size, size) - 1)
+                end = size if end < 0 else end + 1
+                yield path, start, end
+                start = end
+
+
+def iter_validate_file(path, jobs=None, chunk_size=1 << 24):
+    """Validate a file in parallel, chunk by chunk.
+
+    Yield, in file order, the number of the first line of each chunk,
+    its classes as bytes and a list of (line number, offset, line) for
+    its invalid lines. Only a few chunks are held in memory at a time.
+
+    """
+    with multiprocessing.Pool(jobs) as pool:
+        first = 1
+        for codes, errors in pool.imap(
+                _validate_chunk, chunks(path, chunk_size)):
+            yield first, codes, [
+                (first + i, offset, line) for i, offset, line in errors]
+            first += len(codes)
+
+
+def validate_file(path, jobs=None, chunk_size=1 << 24):
+    """Validate a file, returning the classes of all lines and the errors.
+
+    The classes are a compact array with one byte per line, the errors
+    a list of (line number, offset, line) tuples.
+
+    """
+    codes = array('B')
+    errors = []
+    for _, chunk_codes, chunk_errors in iter_validate_file(
+            path, jobs, chunk_size):
+        codes.frombytes(chunk_codes)
+        errors.extend(chunk_errors)
+    return codes, errors
+
+
+def main(argv=None):
+    """Validate a file of KSW strings, one per line."""
+    parser = argparse.ArgumentParser(
+        prog='swip validate',
+        description=__doc__)
+    parser.add_argument(
+        "file",
+        help="The file to validate")
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1 << 24,
+        help="Approximate number of bytes validated per task")
+    parser.add_argument(
+        "-q", "--quiet",
+        action="store_true",
+        default=False,
+        help="Only print the summary, not the invalid lines")
+    args = parser.parse_args(argv)
+
+    counts = [0] * len(NAMES)
+    for _, codes, errors in iter_validate_file(
+            args.file, args.jobs, args.chunk_size):
+        for kind in range(len(NAMES)):
+            counts[kind] += codes.count(kind)
+        if not args.quiet:
+            for number, offset, line in errors:
+                print('{:s}:{:d}:{:d}: {:s}'.format(
+                    args.file, number, offset + 1, line))
+    print(', '.join('{:d} {:s}'.format(count, name)
+                    for count, name in zip(counts, NAMES)),
+          file=sys.stderr)
+    return 1 if counts[INVALID] else 0